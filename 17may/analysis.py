@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+import hashlib
+import os
+from dataclasses import astuple
+
+from record_cache import load_record, store_record, open_record, derived_dir, create_values, finish_record
+from pyramid import build_pyramid
+from perf_trace import TRACE
+from psd_engine import welch_psd, csd_matrix
+from envelope import envelope_spectrum
+from filters import filter_channels
+from resampling import decimate_channels, decimated_length
+from integration import QUANTITIES, integrate_channels
+from speed_bins import speed_binned_psd
+from segmentation import segment_run
+from channel_pages import channel_batches
+
+# The analysis steps shared by the GUI and the batch command line.
+# Nothing in here may import tkinter. Every channel of a record is used;
+# the steps that work per channel go a page of channels at a time.
+
+
+def read_table(file_path):
+    if file_path.endswith('.csv'):
+        chunksize = 100000  # Adjust this based on available memory
+        return pd.concat(pd.read_csv(file_path, chunksize=chunksize), ignore_index=True)
+    elif file_path.endswith('.xlsx'):
+        # Specify engine for Excel files
+        return pd.read_excel(file_path, engine='openpyxl')
+    elif file_path.endswith('.tdms'):
+        # npTDMS is only needed for TDMS files
+        from nptdms import TdmsFile
+        channels = [channel for group in TdmsFile.read(file_path).groups() for channel in group.channels()]
+        return pd.DataFrame({channel.name: channel[:] for channel in channels})
+    raise ValueError(f"Unsupported file type: {file_path}")
+
+
+def load_data(file_path):
+    # Parsed files are kept as a binary record plus a min/max pyramid
+    # next to them, so reopening a run skips parsing and rebuilding
+    data, record_path = load_record(file_path)
+    if data is None:
+        data = read_table(file_path)
+        record_path = store_record(file_path, data)
+        if record_path is not None:
+            build_pyramid(record_path)
+            # Hand back the memory-mapped record so the parsed copy can be freed
+            data, record_path = load_record(file_path)
+    return data, record_path
+
+
+def load_derived(record_path, name, build):
+    # A record computed from the one in record_path and cached inside it, with
+    # its own pyramid. build(values, columns, path) writes values.npy in path
+    # from the source values (n_columns, n_rows) and returns the new columns.
+    path = derived_dir(record_path, name)
+    data = open_record(path)
+    if data is None:
+        source = open_record(record_path)
+        values = np.load(os.path.join(record_path, 'values.npy'), mmap_mode='r')
+        columns = build(values, list(source.columns), path)
+        build_pyramid(path)
+        finish_record(path, columns)
+        data = open_record(path)
+    return data, path
+
+
+def filter_record(data, record_path, spec, sampling_freq):
+    # Filters every channel with the FilterSpec, the time column is kept.
+    # Cached records are filtered chunk by chunk straight into a derived
+    # record; data that could not be cached is filtered in memory.
+    sos = spec.sos(sampling_freq)
+    with TRACE.stage('filter', samples=data.size, filter=spec.name(sampling_freq)):
+        if record_path is None:
+            values = data.to_numpy(dtype=np.float64).T
+            out = np.empty_like(values)
+            out[0] = values[0]
+            filter_channels(values[1:], out[1:], sos, spec.zero_phase)
+            return pd.DataFrame(out.T, columns=data.columns, copy=False), None
+
+        def build(values, columns, path):
+            out = create_values(path, values.shape)
+            out[0] = values[0]
+            filter_channels(values[1:], out[1:], sos, spec.zero_phase)
+            out.flush()
+            return columns
+        return load_derived(record_path, spec.name(sampling_freq), build)
+
+
+def decimate_record(data, record_path, q):
+    # Every channel decimated by q with an anti-aliasing polyphase filter, the
+    # time column is subsampled. Cached as a derived record like filtering.
+    if q == 1:
+        return data, record_path
+    with TRACE.stage('decimate', samples=data.size, factor=q):
+        if record_path is None:
+            values = data.to_numpy(dtype=np.float64).T
+            out = np.empty((values.shape[0], decimated_length(values.shape[1], q)))
+            out[0] = values[0, ::q]
+            decimate_channels(values[1:], out[1:], q)
+            return pd.DataFrame(out.T, columns=data.columns, copy=False), None
+
+        def build(values, columns, path):
+            out = create_values(path, (values.shape[0], decimated_length(values.shape[1], q)))
+            out[0] = values[0, ::q]
+            decimate_channels(values[1:], out[1:], q)
+            out.flush()
+            return columns
+        return load_derived(record_path, f'decimate-{q}', build)
+
+
+def integrate_record(data, record_path, quantity, highpass, sampling_freq):
+    # Every channel integrated to velocity or displacement, the time column is
+    # kept. The values are scaled so the usual calibration gives mm/s or mm.
+    unit, order = QUANTITIES[quantity]
+    if not 0 < highpass < sampling_freq / 2:
+        raise ValueError(f"the integration high-pass must be between 0 and {sampling_freq / 2:g} Hz")
+    with TRACE.stage('integrate', samples=data.size, quantity=quantity):
+        if record_path is None:
+            values = data.to_numpy(dtype=np.float64).T
+            out = np.empty_like(values)
+            out[0] = values[0]
+            integrate_channels(values[1:], out[1:], sampling_freq, order, highpass)
+            return pd.DataFrame(out.T, columns=data.columns, copy=False), None
+
+        def build(values, columns, path):
+            out = create_values(path, values.shape)
+            out[0] = values[0]
+            integrate_channels(values[1:], out[1:], sampling_freq, order, highpass)
+            out.flush()
+            return columns
+        return load_derived(record_path, f'{quantity}-hp{highpass:g}-fs{sampling_freq:g}', build)
+
+
+def channel_label(k):
+    return f'Channel {k//3 + 1} - {"XYZ"[k % 3]}'
+
+
+def channel_count(data):
+    return data.shape[1] - 1
+
+
+def by_channel_pages(compute, values):
+    # compute(columns) on one page of columns of values at a time. Its last
+    # result has one entry per column along the last axis and is joined up,
+    # the others are the same for every page and come from the first.
+    results = [compute(values[:, first:stop]) for first, stop in channel_batches(values.shape[1])] or [compute(values)]
+    return (*results[0][:-1], np.concatenate([result[-1] for result in results], axis=-1))
+
+
+def select_range(data, selected_range):
+    # The rows with start <= time <= end. Time increases down a record, so
+    # this is a slice of rows and a cached record stays memory-mapped
+    if selected_range is None:
+        return data
+    start, end = selected_range
+    time = data.iloc[:, 0].to_numpy()
+    return data.iloc[np.searchsorted(time, start, side='left'):np.searchsorted(time, end, side='right')]
+
+
+def glevel_stats(data, sensitivity):
+    # Peak, trough and RMS G-level per channel. Worked out on the raw values
+    # and scaled afterwards so no calibrated copy of the run is made, a page
+    # of channels at a time.
+    scale = 1000 / sensitivity
+    time = data.iloc[:, 0].to_numpy()
+    frames = []
+    for first, stop in channel_batches(channel_count(data)):
+        values = data.iloc[:, 1 + first:1 + stop].to_numpy()
+        cols = np.arange(values.shape[1])
+
+        imax = values.argmax(axis=0)
+        imin = values.argmin(axis=0)
+        if scale < 0:
+            imax, imin = imin, imax
+
+        frames.append(pd.DataFrame({
+            'channel': [channel_label(first + k) for k in cols],
+            'max_g': values[imax, cols] * scale,
+            'max_time': time[imax],
+            'min_g': values[imin, cols] * scale,
+            'min_time': time[imin],
+            'rms_g': np.sqrt(np.einsum('ij,ij->j', values, values) / len(values)) * abs(scale),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def compute_psd(values, sensitivity, sampling_freq, settings):
+    # Welch PSD of every column with the given SpectralSettings, a page of
+    # columns at a time. Returns f and Pxx of shape (n_freq, n_channels)
+    values = np.asarray(values)
+    with TRACE.stage('welch_psd', samples=values.size, nfft=settings.fft_length()):
+        return by_channel_pages(lambda columns: welch_psd(columns, sampling_freq, settings, scale=1000 / sensitivity), values)
+
+
+def cached_psd(data, record_path, sensitivity, sampling_freq, settings):
+    # PSD of every channel of the whole record, kept in the record's cache
+    # directory per calibration and spectral settings
+    channels = channel_count(data)
+    key = repr((channels, float(sensitivity), float(sampling_freq), astuple(settings)))
+    path = None
+    if record_path is not None:
+        path = os.path.join(record_path, f'psd-{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz')
+        try:
+            with np.load(path) as cached:
+                return cached['f'], cached['Pxx']
+        except (OSError, KeyError, ValueError):
+            pass
+    f, Pxx = compute_psd(data.iloc[:, 1:].to_numpy(), sensitivity, sampling_freq, settings)
+    if path is not None:
+        # Written aside and renamed, a worker may be reading the same run
+        try:
+            with open(path + '.tmp', 'wb') as out:
+                np.savez(out, f=f, Pxx=Pxx)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass
+    return f, Pxx
+
+
+def compute_csd(values, sensitivity, sampling_freq, settings):
+    # Cross-spectral density matrix of every channel pair from one pass over
+    # the segment FFTs, returns f and S of shape (n_freq, n_channels, n_channels)
+    values = np.asarray(values)
+    with TRACE.stage('csd_matrix', samples=values.size, nfft=settings.fft_length()):
+        return csd_matrix(values, sampling_freq, settings, scale=1000 / sensitivity)
+
+
+def compute_envelope_spectrum(values, sensitivity, sampling_freq, band, settings):
+    # Spectrum of the Hilbert envelope of every column after band-passing to
+    # band (low, high) in Hz, returns f and P of shape (n_freq, n_channels)
+    values = np.asarray(values)
+    with TRACE.stage('envelope_spectrum', samples=values.size, band=list(band)):
+        return by_channel_pages(lambda columns: envelope_spectrum(columns, sampling_freq, band, settings, scale=1000 / sensitivity), values)
+
+
+def compute_speed_psd(values, time, sensitivity, sampling_freq, settings, velocity, width):
+    # Mean PSD per speed bin of width km/h for every column, see speed_binned_psd
+    values = np.asarray(values)
+    with TRACE.stage('speed_binned_psd', samples=values.size, nfft=settings.fft_length()):
+        return by_channel_pages(lambda columns: speed_binned_psd(columns, time, sampling_freq, settings, velocity, width, scale=1000 / sensitivity), values)
+
+
+def detect_segments(data, sensitivity, velocity=None, **options):
+    # Named operating-condition segments of the run, see segment_run
+    with TRACE.stage('detect_segments', samples=len(data) * channel_count(data)):
+        return segment_run(data.iloc[:, 0].to_numpy(), data.iloc[:, 1:].to_numpy(), 1000 / sensitivity, velocity, **options)
+
+
+def segment_psds(data, segments, sensitivity, sampling_freq, settings):
+    # PSD of every channel for each segment long enough for one Welch segment.
+    # Returns f and a list of (segment name, Pxx).
+    f, results = None, []
+    for segment in segments.itertuples():
+        subset = select_range(data, (segment.start, segment.end))
+        if len(subset) < settings.nperseg:
+            continue
+        f, Pxx = compute_psd(subset.iloc[:, 1:].to_numpy(), sensitivity, sampling_freq, settings)
+        results.append((segment.name, Pxx))
+    return f, results
@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import urllib.error
+import urllib.request
+from argparse import Namespace
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+from analysis import load_data, select_range, glevel_stats, compute_psd, cached_psd
+from perf_trace import TRACE, timed
+from psd_engine import SpectralSettings
+
+# Optional local analysis service, so several people (or the GUI and a cron
+# job) share one set of workers and one cache instead of each parsing and
+# computing the same runs:
+#
+#   python analysis_server.py --port 8765 --workers 2
+#
+# Jobs are posted as JSON to /jobs/<load|psd|peaks|export> and answered when
+# done. Identical requests still running are joined rather than run again,
+# finished results are kept in memory, and the record and PSD caches on disk
+# are shared with everything else. GET /status shows the queue and timings.
+# Only listens on localhost; paths in requests are paths on this machine.
+
+DEFAULT_PORT = 8765
+MAX_QUEUED = 64
+RESULT_CACHE_SIZE = 256
+
+
+# Jobs, run in the worker processes. Results must be JSON-serialisable.
+
+def job_load(file):
+    data, record_path = load_data(file)
+    return {'record_path': record_path, 'columns': list(data.columns), 'rows': len(data)}
+
+
+def job_psd(file, sensitivity, sampling_freq, settings, range=None):
+    settings = SpectralSettings(**settings)
+    data, record_path = load_data(file)
+    if range is None:
+        f, Pxx = cached_psd(data, record_path, sensitivity, sampling_freq, settings)
+    else:
+        f, Pxx = compute_psd(select_range(data, range).iloc[:, 1:].to_numpy(), sensitivity, sampling_freq, settings)
+    return {'record_path': record_path, 'f': f.tolist(), 'Pxx': Pxx.tolist()}
+
+
+def job_peaks(file, sensitivity, range=None):
+    data, record_path = load_data(file)
+    stats = glevel_stats(select_range(data, range), sensitivity)
+    return {'record_path': record_path, 'peaks': json.loads(stats.to_json(orient='records'))}
+
+
+def job_export(file, options):
+    # options are the batch.py arguments (as parse_args gives them)
+    from batch import process_run
+    args = Namespace(**options)
+    velocity = None
+    if args.velocity:
+        from analysis import read_table
+        velocity_data = read_table(args.velocity)
+        velocity = (velocity_data.iloc[:, 0].to_numpy(), velocity_data.iloc[:, 1].to_numpy())
+    return {'report': process_run(file, args, velocity)}
+
+
+JOBS = {'load': job_load, 'psd': job_psd, 'peaks': job_peaks, 'export': job_export}
+
+
+def run_job(name, params):
+    with timed(f'job_{name}', file=os.path.basename(params.get('file', ''))) as info:
+        result = JOBS[name](**params)
+    return result, info['event']
+
+
+def file_stamp(path):
+    # (size, mtime) of path, None if there is no such file
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except (TypeError, OSError):
+        return None
+
+
+def job_key(name, params):
+    # Requests for the same job on the same version of the file are the same
+    return json.dumps([name, params, file_stamp(params.get('file'))], sort_keys=True)
+
+
+def output_stamp(result):
+    # Stamp of the file a job wrote (an export's report), None for jobs that
+    # only return data
+    return file_stamp(result['report']) if 'report' in result else None
+
+
+class AnalysisServer:
+    def __init__(self, workers=2, max_queued=MAX_QUEUED, cache_size=RESULT_CACHE_SIZE):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.cache_size = cache_size
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self.slots = None       # asyncio.Semaphore, made inside the loop
+        self.inflight = {}      # job key -> task
+        self.results = OrderedDict()  # job key -> (result, output_stamp of it)
+        self.queued = 0
+        self.running = 0
+        self.hits = 0
+
+    async def submit(self, name, params):
+        # (result, how it was served): 'cache', 'joined' or 'computed'
+        if name not in JOBS:
+            raise KeyError(name)
+        key = job_key(name, params)
+        # An export asked to redo the report (batch.py --force) only joins
+        # one already running, it is never answered from the cache
+        forced = bool((params.get('options') or {}).get('force'))
+        if key in self.results and not forced:
+            result, stamp = self.results[key]
+            if output_stamp(result) == stamp:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return result, 'cache'
+            # The report was deleted or overwritten since, it is made again
+            del self.results[key]
+        task = self.inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), 'joined'
+        if self.queued >= self.max_queued:
+            raise OverflowError("the job queue is full, try again later")
+        task = asyncio.ensure_future(self._run(key, name, params))
+        self.inflight[key] = task
+        return await asyncio.shield(task), 'computed'
+
+    async def _run(self, key, name, params):
+        waiting = True
+        self.queued += 1
+        try:
+            async with self.slots:
+                waiting = False
+                self.queued -= 1
+                self.running += 1
+                try:
+                    result, event = await asyncio.get_running_loop().run_in_executor(self.executor, run_job, name, params)
+                finally:
+                    self.running -= 1
+        finally:
+            if waiting:
+                self.queued -= 1
+            self.inflight.pop(key, None)
+        TRACE.add_events([event])
+        self.results[key] = (result, output_stamp(result))
+        while len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+        return result
+
+    def status(self):
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'queued': self.queued,
+            'inflight': len(self.inflight),
+            'cached': len(self.results),
+            'cache_hits': self.hits,
+            'timings': TRACE.summary(),
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            status, body = await self.respond(reader)
+        except Exception as e:
+            status, body = 500, {'error': str(e)}
+        payload = json.dumps(body).encode()
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error', 503: 'Service Unavailable'}[status]
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def respond(self, reader):
+        request = (await reader.readline()).decode('latin-1').split()
+        if len(request) < 2:
+            return 400, {'error': "malformed request"}
+        method, path = request[0], request[1]
+        length = 0
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            header, _, value = line.partition(':')
+            if header.lower() == 'content-length':
+                length = int(value)
+
+        if method == 'GET' and path == '/status':
+            return 200, self.status()
+        if method != 'POST' or not path.startswith('/jobs/'):
+            return 404, {'error': f"no such endpoint: {method} {path}"}
+        try:
+            params = json.loads(await reader.readexactly(length)) if length else {}
+        except ValueError:
+            return 400, {'error': "the request body is not JSON"}
+        try:
+            result, served = await self.submit(path[len('/jobs/'):], params)
+        except KeyError:
+            return 404, {'error': f"no such job: {path[len('/jobs/'):]}, one of {', '.join(JOBS)}"}
+        except OverflowError as e:
+            return 503, {'error': str(e)}
+        except (TypeError, ValueError, OSError) as e:
+            return 400, {'error': str(e)}
+        return 200, {'result': result, 'served': served}
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"analysis server on http://{host}:{port} with {self.workers} workers", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+
+class AnalysisClient:
+    # Thin blocking client for the GUI and the command line. Paths are sent
+    # absolute, the server resolves them on the same machine.
+    def __init__(self, url=f'http://127.0.0.1:{DEFAULT_PORT}', timeout=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, path, params=None):
+        data = None if params is None else json.dumps(params).encode()
+        request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e)['error']
+            except (ValueError, KeyError):
+                message = str(e)
+            raise RuntimeError(f"analysis server: {message}") from None
+
+    def job(self, name, **params):
+        if 'file' in params:
+            params['file'] = os.path.abspath(params['file'])
+        return self.request(f'/jobs/{name}', params)['result']
+
+    def status(self):
+        return self.request('/status')
+
+    def load(self, file):
+        return self.job('load', file=file)
+
+    def psd(self, file, sensitivity, sampling_freq, settings, range=None):
+        # f, Pxx and the record path on the server's machine
+        result = self.job('psd', file=file, sensitivity=sensitivity, sampling_freq=sampling_freq,
+                          settings=asdict(settings), range=list(range) if range else None)
+        return np.asarray(result['f']), np.asarray(result['Pxx']), result['record_path']
+
+    def peaks(self, file, sensitivity, range=None):
+        result = self.job('peaks', file=file, sensitivity=sensitivity, range=list(range) if range else None)
+        return pd.DataFrame(result['peaks'])
+
+    def export(self, file, options):
+        return self.job('export', file=file, options=options)['report']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local analysis server shared by the GUI and batch.py.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=2, help="jobs run at the same time")
+    parser.add_argument('--max-queued', type=int, default=MAX_QUEUED, help="jobs waiting before requests are refused")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(AnalysisServer(args.workers, args.max_queued).serve(port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from analysis import (channel_count, load_data, read_table, select_range, glevel_stats, compute_psd, decimate_record, integrate_record,
+                      detect_segments, segment_psds, channel_label)
+from plots import new_figure, plot_glevel_axes, plot_psd_axes
+from pyramid import Pyramid
+from report_export import write_report
+from perf_trace import TRACE
+from psd_engine import SpectralSettings, WINDOWS, DETRENDS, AVERAGES, SCALINGS
+from octave_bands import FRACTIONS, octave_bands, band_table
+from resampling import FACTORS
+from integration import QUANTITIES
+from segmentation import segment_psd_table
+
+# Headless version of the G-Level and PSD Plotter: the same load, calibrate,
+# G-level, PSD and report steps as the GUI, for cron jobs on a server.
+#
+#   python batch.py runs/*.csv --sensitivity 10 --fs 25000 --nperseg 2048 --out-dir reports
+#
+# Runs whose report is newer than the data file are skipped unless --force.
+# With --server URL the runs are handed to a running analysis_server.py
+# instead, which shares its workers and caches with other users.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch G-level and PSD reports without the GUI.")
+    parser.add_argument('files', nargs='+', help="CSV/Excel vibration files")
+    parser.add_argument('--sensitivity', type=float, required=True, help="sensor sensitivity")
+    parser.add_argument('--fs', type=float, required=True, help="sampling frequency [Hz]")
+    parser.add_argument('--nperseg', type=int, default=2048, help="samples per Welch segment")
+    parser.add_argument('--window', choices=WINDOWS, default='hann')
+    parser.add_argument('--overlap', type=float, default=50.0, help="segment overlap [%%]")
+    parser.add_argument('--nfft', type=int, help="FFT length, rounded up to a fast length (default: nperseg)")
+    parser.add_argument('--detrend', choices=DETRENDS, default='constant')
+    parser.add_argument('--average', choices=AVERAGES, default='mean')
+    parser.add_argument('--scaling', choices=SCALINGS, default='density')
+    parser.add_argument('--two-sided', action='store_true')
+    parser.add_argument('--decimate', type=int, choices=FACTORS, default=1, help="analyse at fs / DECIMATE, cached per run")
+    parser.add_argument('--quantity', choices=list(QUANTITIES), default='acceleration', help="integrate to velocity [mm/s] or displacement [mm]")
+    parser.add_argument('--integration-highpass', type=float, default=2.0, help="high-pass cutoff of the integration [Hz]")
+    parser.add_argument('--range', type=float, nargs=2, metavar=('START', 'END'), help="time range for the PSD")
+    parser.add_argument('--octave', choices=list(FRACTIONS), help="also write band RMS levels in these octave bands")
+    parser.add_argument('--segments', action='store_true', help="detect operating-condition segments and write a PSD per segment")
+    parser.add_argument('--velocity', help="velocity profile drawn on the G-level plots")
+    parser.add_argument('--out-dir', help="where reports go, defaults to next to each file")
+    parser.add_argument('--workers', type=int, help="processes used to render the report figures")
+    parser.add_argument('--trace', help="write a Chrome trace (JSON) of the stage timings")
+    parser.add_argument('--force', action='store_true', help="redo runs that already have a report")
+    parser.add_argument('--server', help="URL of an analysis server to run the exports on")
+    args = parser.parse_args(argv)
+    try:
+        check_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def check_options(args):
+    # Raises ValueError for options that cannot go together, before a run
+    # writes any of its output
+    if args.octave and (args.scaling != 'density' or args.two_sided):
+        raise ValueError("--octave needs a one-sided PSD with density scaling")
+
+
+def spectral_settings(args):
+    return SpectralSettings(nperseg=args.nperseg, window=args.window, overlap=args.overlap, nfft=args.nfft,
+                            detrend=args.detrend, average=args.average, scaling=args.scaling, onesided=not args.two_sided)
+
+
+def process_run(file_path, args, velocity=None):
+    check_options(args)
+    out_dir = args.out_dir or os.path.dirname(os.path.abspath(file_path))
+    stem = os.path.join(out_dir, os.path.splitext(os.path.basename(file_path))[0])
+    report_path = stem + '_report.docx'
+    if not args.force and os.path.exists(report_path) and os.path.getmtime(report_path) >= os.path.getmtime(file_path):
+        print(f"{file_path}: up to date")
+        return report_path
+
+    with TRACE.stage('load_file', file=os.path.basename(file_path)) as info:
+        data, record_path = decimate_record(*load_data(file_path), args.decimate)
+        if args.quantity != 'acceleration':
+            data, record_path = integrate_record(data, record_path, args.quantity, args.integration_highpass, args.fs / args.decimate)
+        pyramid = Pyramid.open(record_path) if record_path is not None else None
+        info['samples'] = data.size
+    channels = channel_count(data)
+    scale = 1000 / args.sensitivity
+
+    stats = glevel_stats(data, args.sensitivity)
+    if args.quantity != 'acceleration':
+        unit = QUANTITIES[args.quantity][0].replace('/', '_')
+        stats.columns = [c.replace('_g', f'_{unit}') for c in stats.columns]
+    stats.to_csv(stem + '_glevels.csv', index=False)
+
+    data_subset = select_range(data, args.range)
+    settings = spectral_settings(args)
+    f, Pxx = compute_psd(data_subset.iloc[:, 1:].to_numpy(), args.sensitivity, args.fs / args.decimate, settings)
+    psd_table = {'frequency_hz': f}
+    psd_table.update({data.columns[k + 1]: Pxx[:, k] for k in range(channels)})
+    pd.DataFrame(psd_table).to_csv(stem + '_psd.csv', index=False)
+    if args.octave:
+        centres, lower, upper, rms, band_psd = octave_bands(f, Pxx, FRACTIONS[args.octave])
+        band_table(centres, lower, upper, rms, data.columns[1:]).to_csv(stem + '_octave.csv', index=False)
+
+    if args.segments:
+        segments = detect_segments(data, args.sensitivity, velocity)
+        segments.to_csv(stem + '_segments.csv', index=False)
+        f_segments, results = segment_psds(data, segments, args.sensitivity, args.fs / args.decimate, settings)
+        if results:
+            segment_psd_table(f_segments, results, [channel_label(k) for k in range(channels)]).to_csv(stem + '_segment_psd.csv', index=False)
+
+    time = data.iloc[:, 0].to_numpy()
+
+    def plots():
+        # Each figure is made when the report is ready to render it
+        for i in range(0, channels, 3):
+            fig, axs = new_figure(figsize=(10, 10))
+            plot_glevel_axes(axs, {}, time, data.iloc[:, 1:], i, scale, pyramid, velocity)
+            yield 'G-Level Plot', fig
+        for i in range(0, channels, 3):
+            fig, axs = new_figure(figsize=(10, 8))
+            plot_psd_axes(axs, {}, f, Pxx, i, settings.ylabel(QUANTITIES[args.quantity][0]))
+            yield 'PSD Plot', fig
+
+    with TRACE.stage('export_plots') as info:
+        info['figures'] = write_report(report_path, plots(), workers=args.workers)
+    print(f"{file_path}: wrote {report_path}")
+    return report_path
+
+
+def run_on_server(args):
+    from analysis_server import AnalysisClient
+    client = AnalysisClient(args.server)
+    # The server resolves paths itself, so every path goes absolute
+    options = dict(vars(args), files=None, server=None, trace=None)
+    for option in ('out_dir', 'velocity'):
+        if options[option]:
+            options[option] = os.path.abspath(options[option])
+    failed = 0
+    for file_path in args.files:
+        try:
+            with TRACE.stage('remote_export', file=os.path.basename(file_path)):
+                report_path = client.export(file_path, options)
+            print(f"{file_path}: {report_path}")
+        except (RuntimeError, OSError) as e:
+            print(f"{file_path}: failed: {e}", file=sys.stderr)
+            failed += 1
+    if args.trace:
+        TRACE.save(args.trace)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    if args.server:
+        return run_on_server(args)
+
+    velocity = None
+    if args.velocity:
+        velocity_data = read_table(args.velocity)
+        velocity = (velocity_data.iloc[:, 0].to_numpy(), velocity_data.iloc[:, 1].to_numpy())
+
+    failed = 0
+    for file_path in args.files:
+        try:
+            process_run(file_path, args, velocity)
+        except Exception as e:
+            # One bad file should not stop the rest of the nightly run
+            print(f"{file_path}: failed: {e}", file=sys.stderr)
+            failed += 1
+
+    if args.trace:
+        TRACE.save(args.trace)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from analysis import channel_count, read_table, load_data, glevel_stats, compute_psd
+from plots import new_figure, plot_glevel_axes, plot_psd_axes
+from pyramid import Pyramid
+from report_export import write_report
+from memory_telemetry import rss_bytes
+from psd_engine import SpectralSettings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# End-to-end timing of the analysis pipeline on synthetic runs, so that
+# versions can be compared on the same machine:
+#
+#   python benchmark.py --sizes 10s 10min --output before.json
+#   python benchmark.py --sizes 10s 10min --output after.json
+#   python benchmark.py --compare before.json after.json
+
+SIZES = {'10s': 10, '10min': 600, '1h': 3600}
+CHANNELS = 24
+SAMPLING_FREQ = 25000
+SENSITIVITY = 10
+NPERSEG = 2048
+EXCEL_MAX_ROWS = 1048575
+
+
+def synthetic_chunks(seconds, chunk_seconds=10, seed=0):
+    # 24 channels of a few tones plus noise, in volts, generated in chunks
+    rng = np.random.default_rng(seed)
+    tones = rng.uniform(5, 2000, size=(3, CHANNELS))
+    amplitudes = rng.uniform(0.01, 0.5, size=(3, CHANNELS))
+    for start in range(0, seconds, chunk_seconds):
+        t = np.arange(start * SAMPLING_FREQ, min(start + chunk_seconds, seconds) * SAMPLING_FREQ) / SAMPLING_FREQ
+        values = (amplitudes[:, None, :] * np.sin(2 * np.pi * tones[:, None, :] * t[None, :, None])).sum(axis=0)
+        values += rng.normal(0, 0.05, size=values.shape)
+        yield t, values
+
+
+def chunk_frame(t, values):
+    return pd.DataFrame(np.column_stack([t, values]), columns=['Time'] + [f'Ch{k + 1}' for k in range(CHANNELS)])
+
+
+def generate(size, data_dir, formats):
+    # Writes the run once per format, files that already exist are reused
+    seconds = SIZES[size]
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(data_dir, f'synthetic_{size}.{fmt}')
+        paths[fmt] = path
+        if os.path.exists(path):
+            continue
+        if fmt == 'xlsx' and seconds * SAMPLING_FREQ > EXCEL_MAX_ROWS:
+            paths[fmt] = None
+            continue
+        if fmt == 'csv':
+            with open(path, 'w', newline='') as f:
+                for k, (t, values) in enumerate(synthetic_chunks(seconds)):
+                    chunk_frame(t, values).to_csv(f, index=False, header=k == 0)
+        elif fmt == 'xlsx':
+            pd.concat([chunk_frame(t, v) for t, v in synthetic_chunks(seconds)]).to_excel(path, index=False)
+        elif fmt == 'tdms':
+            try:
+                from nptdms import TdmsWriter, ChannelObject
+            except ImportError:
+                paths[fmt] = None
+                continue
+            with TdmsWriter(path) as writer:
+                for t, values in synthetic_chunks(seconds):
+                    writer.write_segment([ChannelObject('Vibration', 'Time', t)] +
+                                         [ChannelObject('Vibration', f'Ch{k + 1}', values[:, k]) for k in range(CHANNELS)])
+    return paths
+
+
+class StageTimer:
+    # Wall time, CPU time (including worker processes) and peak RSS of one stage.
+    # RSS is sampled from a background thread while the stage runs.
+    def __init__(self, interval=0.01):
+        self.interval = interval
+
+    def run(self, func):
+        peak = [rss_bytes()]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                peak[0] = max(peak[0], rss_bytes())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+        cpu, wall = time.process_time(), time.perf_counter()
+        try:
+            result = func()
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if children is not None:
+                after = resource.getrusage(resource.RUSAGE_CHILDREN)
+                cpu += (after.ru_utime - children.ru_utime) + (after.ru_stime - children.ru_stime)
+            done.set()
+            sampler.join()
+        peak[0] = max(peak[0], rss_bytes())
+        return result, {'wall_s': wall, 'cpu_s': cpu, 'peak_rss_mb': peak[0] / 2**20}
+
+
+def run_size(size, data_dir, formats, out_dir):
+    timer = StageTimer()
+    results = []
+    samples = SIZES[size] * SAMPLING_FREQ * CHANNELS
+
+    def record(stage, func, n=samples):
+        result, stats = timer.run(func)
+        stats.update({'size': size, 'stage': stage, 'samples': n, 'msamples_per_s': n / stats['wall_s'] / 1e6 if stats['wall_s'] else None})
+        results.append(stats)
+        print(f"{size:>6} {stage:<16} {stats['wall_s']:8.3f} s  {stats['cpu_s']:8.3f} cpu-s  {stats['peak_rss_mb']:8.1f} MB", flush=True)
+        return result
+
+    paths = generate(size, data_dir, formats)
+    for fmt in formats:
+        if paths[fmt] is None:
+            results.append({'size': size, 'stage': f'load_{fmt}', 'skipped': True})
+            continue
+        record(f'load_{fmt}', lambda: read_table(paths[fmt]))
+
+    # Everything after loading works from the binary record, as the GUI does
+    csv_path = paths.get('csv') or next(p for p in paths.values() if p)
+    load_data(csv_path)
+    data, record_path = record('load_cached', lambda: load_data(csv_path))
+    channels = channel_count(data)
+
+    record('calibration', lambda: data.iloc[:, 1:].to_numpy() * 1000 / SENSITIVITY)
+    f, Pxx = record('welch_psd', lambda: compute_psd(data.iloc[:, 1:].to_numpy(), SENSITIVITY, SAMPLING_FREQ, SpectralSettings(nperseg=NPERSEG)))
+    record('peak_detection', lambda: (glevel_stats(data, SENSITIVITY), Pxx.argmax(axis=0), Pxx.argmin(axis=0)))
+
+    def render():
+        pyramid = Pyramid.open(record_path) if record_path is not None else None
+        time_ = data.iloc[:, 0].to_numpy()
+        # A bare Figure's canvas draws nothing, an Agg canvas renders it as the GUI would
+        plots = []
+        for i in range(0, channels, 3):
+            fig, axs = new_figure(figsize=(10, 10))
+            plot_glevel_axes(axs, {}, time_, data.iloc[:, 1:], i, 1000 / SENSITIVITY, pyramid)
+            FigureCanvasAgg(fig).draw()
+            plots.append(('G-Level Plot', fig))
+        for i in range(0, channels, 3):
+            fig, axs = new_figure(figsize=(10, 8))
+            plot_psd_axes(axs, {}, f, Pxx, i)
+            FigureCanvasAgg(fig).draw()
+            plots.append(('PSD Plot', fig))
+        return plots
+
+    plots = record('figure_render', render)
+    record('docx_export', lambda: write_report(os.path.join(out_dir, f'synthetic_{size}.docx'), plots))
+    return results
+
+
+def gui_cold_start():
+    # The GUI started in a fresh interpreter, timed until its event loop is
+    # idle. Needs a display, skipped where there is none.
+    gui = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'guiver2.2.1.py')
+
+    def start():
+        run = subprocess.run([sys.executable, gui, '--startup-time'], capture_output=True, text=True, timeout=120)
+        for line in run.stdout.splitlines():
+            if line.startswith('cold_start_s='):
+                return float(line.split('=')[1])
+        return None
+
+    try:
+        reported, stats = StageTimer().run(start)
+    except (OSError, subprocess.TimeoutExpired):
+        reported = None
+    if reported is None:
+        return {'size': '-', 'stage': 'gui_cold_start', 'skipped': True}
+    stats.update({'size': '-', 'stage': 'gui_cold_start', 'samples': 0, 'msamples_per_s': None, 'cold_start_s': reported})
+    print(f"{'-':>6} {'gui_cold_start':<16} {stats['wall_s']:8.3f} s  {stats['cpu_s']:8.3f} cpu-s  (window ready after {reported:.3f} s)", flush=True)
+    return stats
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r['size'], r['stage']): r for r in json.load(f)['results'] if not r.get('skipped')}
+    with open(new_path) as f:
+        new = {(r['size'], r['stage']): r for r in json.load(f)['results'] if not r.get('skipped')}
+    print(f"{'size':>6} {'stage':<16} {'old s':>9} {'new s':>9} {'speedup':>8} {'old MB':>9} {'new MB':>9}")
+    for key in new:
+        if key in old:
+            o, n = old[key], new[key]
+            print(f"{key[0]:>6} {key[1]:<16} {o['wall_s']:9.3f} {n['wall_s']:9.3f} {o['wall_s'] / n['wall_s']:7.2f}x "
+                  f"{o['peak_rss_mb']:9.1f} {n['peak_rss_mb']:9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the G-level/PSD pipeline on synthetic runs.")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10s'])
+    parser.add_argument('--formats', nargs='+', choices=['csv', 'xlsx', 'tdms'], default=['csv', 'xlsx', 'tdms'])
+    parser.add_argument('--data-dir', default='bench_data', help="synthetic runs are written here and reused")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="print the change between two reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = [gui_cold_start()]
+    for size in args.sizes:
+        results += run_size(size, args.data_dir, args.formats, args.data_dir)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
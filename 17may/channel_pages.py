@@ -0,0 +1,26 @@
+# Channels are shown and computed a page at a time, so a rig with hundreds
+# of channels costs the same memory as one with a page of them. A page is
+# eight triaxial figures; everything that runs over all channels goes in
+# passes of one page of columns. No numpy here, the GUI uses it at startup.
+
+PAGE_CHANNELS = 24
+
+
+def page_count(channels, size=PAGE_CHANNELS):
+    return max(-(-channels // size), 1)
+
+
+def page_range(page, channels, size=PAGE_CHANNELS):
+    # (first, stop) channel indices of page, which is clamped to the pages there are
+    page = min(max(page, 0), page_count(channels, size) - 1)
+    return page * size, min((page + 1) * size, channels)
+
+
+def channel_batches(channels, size=PAGE_CHANNELS):
+    # (first, stop) of every page in order
+    return [(first, min(first + size, channels)) for first in range(0, channels, size)]
+
+
+def page_text(page, channels, size=PAGE_CHANNELS):
+    first, stop = page_range(page, channels, size)
+    return f"Page {page + 1} of {page_count(channels, size)}: channels {first + 1}-{stop} of {channels}"
@@ -0,0 +1,64 @@
+import numpy as np
+from scipy.fft import next_fast_len
+from scipy.signal import butter, sosfiltfilt, hilbert
+
+from psd_engine import segment_spectra, spectral_frequencies, fold_onesided
+
+# Envelope (demodulation) spectra for bearing and gear faults: band-pass
+# around the resonance the impacts excite, take the Hilbert envelope and
+# look at the spectrum of the envelope, where the fault rates show up.
+#
+# Long records are processed in overlapped blocks. Each block is filtered
+# and demodulated with a margin on both sides that is thrown away, so the
+# block edges see neither the filter transient nor the Hilbert wrap-around.
+
+BLOCK = 2**17
+FILTER_ORDER = 4
+
+
+def bandpass_sos(band, sampling_freq, order=FILTER_ORDER):
+    low, high = band
+    if not 0 < low < high < sampling_freq / 2:
+        raise ValueError(f"band must lie between 0 and {sampling_freq / 2:g} Hz with low < high")
+    return butter(order, (low, high), btype='bandpass', fs=sampling_freq, output='sos')
+
+
+def envelope_blocks(values, sampling_freq, band, block=BLOCK):
+    # Yields the envelope of every column of values, block by block in order
+    values = np.asarray(values)
+    sos = bandpass_sos(band, sampling_freq)
+    # Ten periods of the low band edge covers the filter's ring-down
+    margin = int(10 * sampling_freq / band[0]) + 1
+    for start in range(0, len(values), block):
+        lo, hi = max(start - margin, 0), min(start + block + margin, len(values))
+        filtered = sosfiltfilt(sos, values[lo:hi], axis=0)
+        analytic = hilbert(filtered, N=next_fast_len(len(filtered)), axis=0)[:hi - lo]
+        yield np.abs(analytic[start - lo:start - lo + min(block, len(values) - start)])
+
+
+def envelope_spectrum(values, sampling_freq, band, settings, scale=1.0, block=BLOCK):
+    # Welch spectrum of the envelopes of all columns, (n_freq, n_channels).
+    # The envelope is never held in full: the samples a block leaves over
+    # after its last whole segment are carried into the next block, so the
+    # segments are exactly those welch would use on the whole envelope.
+    # Segments are mean-averaged as they come; a median would need every
+    # segment's power kept, which is what the blocks are there to avoid.
+    settings.validate()
+    if settings.average != 'mean':
+        raise ValueError("envelope spectra are always mean-averaged, set Averaging to mean")
+    step = settings.nperseg - settings.noverlap()
+    power, count = 0, 0
+    carry = None
+    for env in envelope_blocks(values, sampling_freq, band, block):
+        buffer = env if carry is None else np.concatenate([carry, env])
+        segments = (len(buffer) - settings.nperseg) // step + 1
+        if segments > 0:
+            used = buffer[:(segments - 1) * step + settings.nperseg]
+            for X in segment_spectra(used, sampling_freq, settings, scale):
+                power = power + (np.abs(X)**2).sum(axis=0)
+                count += len(X)
+            buffer = buffer[segments * step:]
+        carry = buffer
+    if count == 0:
+        raise ValueError("the range is shorter than one segment")
+    return spectral_frequencies(sampling_freq, settings), fold_onesided((power / count).T, settings)
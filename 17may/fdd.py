@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+# Frequency domain decomposition: the singular values of the CSD matrix at
+# every frequency line peak at the natural frequencies, and the first
+# singular vector there is the operational deflection shape.
+
+
+def decompose(S):
+    # One stacked SVD over the frequency axis of the (n_freq, n_ch, n_ch)
+    # CSD matrix. Returns the singular values (n_freq, n_ch), largest first,
+    # and the first singular vector at every line (n_freq, n_ch).
+    U, s, _ = np.linalg.svd(S, hermitian=True)
+    return s, U[:, :, 0]
+
+
+def pick_peaks(f, s1, count=5, fmin=None, fmax=None, prominence=0.5):
+    # The count most prominent peaks of the first singular value between fmin
+    # and fmax, in increasing frequency. prominence is in decades, peaks of
+    # noise are rarely more than half a decade above their surroundings.
+    band = np.ones(len(f), dtype=bool)
+    if fmin is not None:
+        band &= f >= fmin
+    if fmax is not None:
+        band &= f <= fmax
+    candidates = np.flatnonzero(band)
+    level = np.log10(np.maximum(s1[candidates], np.finfo(float).tiny))
+    peaks, properties = find_peaks(level, prominence=prominence)
+    strongest = np.argsort(properties['prominences'])[::-1][:count]
+    return np.sort(candidates[peaks[strongest]])
+
+
+def mode_shapes(vectors, peaks):
+    # Real mode shapes from the singular vectors at the peaks: each vector is
+    # rotated so its largest component is real, then scaled to a maximum of 1
+    shapes = vectors[peaks]
+    largest = shapes[np.arange(len(peaks)), np.abs(shapes).argmax(axis=1)]
+    shapes = np.real(shapes * np.conj(largest)[:, None] / np.abs(largest)[:, None])
+    return shapes / np.abs(shapes).max(axis=1, keepdims=True)
+
+
+def mode_table(f, peaks, shapes):
+    # One row per mode and sensor location with the X, Y and Z deflections,
+    # channels are taken as consecutive triaxial groups as in channel_label
+    rows = []
+    for m, (peak, shape) in enumerate(zip(peaks, shapes)):
+        for sensor in range(-(-len(shape) // 3)):
+            xyz = list(shape[3 * sensor:3 * sensor + 3]) + [np.nan] * 3
+            rows.append({'mode': m + 1, 'frequency_hz': f[peak], 'sensor': sensor + 1,
+                         'x': xyz[0], 'y': xyz[1], 'z': xyz[2]})
+    return pd.DataFrame(rows)
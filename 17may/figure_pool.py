@@ -0,0 +1,127 @@
+from tkinter import ttk
+from matplotlib.figure import Figure
+from matplotlib.backend_bases import FigureCanvasBase
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+TOOLBAR_HEIGHT = 40
+
+
+class PlotSlot:
+    # One figure kept alive between replots. The Tk canvas and toolbar only
+    # exist while the slot is near the visible part of the scroll area,
+    # otherwise the slot is an empty placeholder frame of the same size.
+    # artists is free for the plotting code to keep lines it wants to update.
+    def __init__(self, master, nrows, figsize):
+        # Figure instead of plt.subplots, pyplot would keep every figure alive
+        self.fig = Figure(figsize=figsize)
+        self.axs = self.fig.subplots(nrows, 1)
+        self.height = int(figsize[1] * self.fig.dpi) + TOOLBAR_HEIGHT
+        self.frame = ttk.Frame(master, width=int(figsize[0] * self.fig.dpi), height=self.height)
+        self.frame.pack_propagate(False)
+        self.canvas = None
+        self.toolbar = None
+        self.artists = {}
+
+    def realize(self):
+        if self.canvas is None:
+            self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame)
+            self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame)
+            self.toolbar.update()
+            self.canvas.get_tk_widget().pack(fill='both', expand=True)
+            self.canvas.draw_idle()
+
+    def unrealize(self):
+        if self.canvas is not None:
+            self.toolbar.destroy()
+            self.canvas.get_tk_widget().destroy()
+            self.canvas = None
+            self.toolbar = None
+            # Detach the figure from the destroyed widget
+            FigureCanvasBase(self.fig)
+
+    def destroy(self):
+        for artist in self.artists.values():
+            if hasattr(artist, 'disconnect'):
+                artist.disconnect()
+        self.artists.clear()
+        self.unrealize()
+        self.frame.destroy()
+        self.fig.clear()
+
+
+class FigurePool:
+    # Replotting goes begin() -> acquire() per figure -> finish(). Slots are
+    # reused in order, new ones are only made when more figures are needed
+    # and the ones left over are destroyed.
+    # viewport is the scrolling tk.Canvas holding master; scrolling it
+    # renders the slots coming into view and drops the ones leaving it.
+    def __init__(self, master, viewport, scrollbar, nrows=3, figsize=(10, 10)):
+        self.master = master
+        self.viewport = viewport
+        self.scrollbar = scrollbar
+        self.nrows = nrows
+        self.figsize = figsize
+        self.slots = []
+        self.used = 0
+        self._refresh_pending = None
+
+        self.viewport.configure(yscrollcommand=self.on_scroll)
+        self.viewport.bind("<Configure>", lambda e: self.schedule_refresh(), add='+')
+
+    def begin(self):
+        self.used = 0
+
+    def acquire(self):
+        if self.used == len(self.slots):
+            slot = PlotSlot(self.master, self.nrows, self.figsize)
+            slot.frame.pack(fill='x')
+            self.slots.append(slot)
+        slot = self.slots[self.used]
+        self.used += 1
+        return slot
+
+    def finish(self):
+        for slot in self.slots[self.used:]:
+            slot.destroy()
+        del self.slots[self.used:]
+        for slot in self.slots:
+            if slot.canvas is not None:
+                # Drop the old zoom history, it refers to the previous data
+                slot.toolbar.update()
+                slot.canvas.draw_idle()
+        self.schedule_refresh()
+
+    def figures(self):
+        return [slot.fig for slot in self.slots]
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self._refresh_pending is None:
+            self._refresh_pending = self.viewport.after_idle(self.refresh)
+
+    def refresh(self):
+        # Keep canvases for the slots in view plus one on either side
+        self._refresh_pending = None
+        top = self.viewport.canvasy(0)
+        bottom = self.viewport.canvasy(self.viewport.winfo_height())
+        y = 0
+        for slot in self.slots:
+            if y + 2 * slot.height >= top and y - slot.height <= bottom:
+                slot.realize()
+            else:
+                slot.unrealize()
+            y += slot.height
+
+
+def embed_figure(master, figsize=(10, 6), nrows=1):
+    # A single always-rendered figure with its toolbar, for the analysis tabs
+    fig = Figure(figsize=figsize)
+    axs = fig.subplots(nrows, 1)
+    canvas = FigureCanvasTkAgg(fig, master=master)
+    toolbar = NavigationToolbar2Tk(canvas, master)
+    toolbar.update()
+    canvas.get_tk_widget().pack(fill='both', expand=True)
+    return fig, axs, canvas
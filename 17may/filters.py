@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Digital filtering of whole records in chunks of samples. All channels are
+# filtered together as rows of a 2-D array and the filter state is carried
+# from one chunk to the next, so the result is the same as filtering the
+# record in one go without ever holding it all in memory. scipy is only
+# imported once a filter is designed, FilterSpec itself is cheap to import.
+
+KINDS = ('butter', 'cheby1')
+RESPONSES = ('highpass', 'lowpass', 'bandpass', 'bandstop')
+CHUNK = 2**18
+
+
+@dataclass
+class FilterSpec:
+    kind: str = 'butter'
+    response: str = 'highpass'
+    cutoff: tuple = (5.0,)        # Hz, (low, high) for bandpass and bandstop
+    order: int = 4
+    ripple: float = 1.0           # dB, Chebyshev only
+    zero_phase: bool = True
+
+    def validate(self, sampling_freq):
+        if self.kind not in KINDS:
+            raise ValueError(f"{self.kind!r} is not one of {', '.join(KINDS)}")
+        if self.response not in RESPONSES:
+            raise ValueError(f"{self.response!r} is not one of {', '.join(RESPONSES)}")
+        if len(self.cutoff) != (2 if self.response.startswith('band') else 1):
+            raise ValueError(f"a {self.response} filter needs {'two cutoffs' if self.response.startswith('band') else 'one cutoff'}")
+        if not all(0 < c < sampling_freq / 2 for c in self.cutoff) or list(self.cutoff) != sorted(self.cutoff):
+            raise ValueError(f"cutoffs must be increasing and between 0 and {sampling_freq / 2:g} Hz")
+        if self.order < 1:
+            raise ValueError("order must be at least 1")
+
+    def sos(self, sampling_freq):
+        from scipy.signal import butter, cheby1
+        self.validate(sampling_freq)
+        cutoff = self.cutoff if len(self.cutoff) == 2 else self.cutoff[0]
+        if self.kind == 'butter':
+            return butter(self.order, cutoff, btype=self.response, fs=sampling_freq, output='sos')
+        return cheby1(self.order, self.ripple, cutoff, btype=self.response, fs=sampling_freq, output='sos')
+
+    def name(self, sampling_freq):
+        # Identifies the filtered record in the cache
+        cutoff = '-'.join(f'{c:g}' for c in self.cutoff)
+        ripple = f'-r{self.ripple:g}' if self.kind == 'cheby1' else ''
+        phase = 'zp' if self.zero_phase else 'causal'
+        return f'filter-{self.kind}-{self.response}-{cutoff}hz-o{self.order}{ripple}-{phase}-fs{sampling_freq:g}'
+
+
+def filter_channels(x, out, sos, zero_phase=False, chunk=CHUNK):
+    # Filters the rows of x (n_channels, n_samples) into out, which may be a
+    # memory-mapped array. zero_phase runs a forward pass into out and a
+    # backward pass over it, with the same odd extension at both ends as
+    # sosfiltfilt, so the result matches it.
+    from scipy.signal import sosfilt, sosfilt_zi
+    n = x.shape[1]
+    zi = sosfilt_zi(sos)[:, None, :]
+    if not zero_phase:
+        state = zi * np.asarray(x[:, :1])
+        for a in range(0, n, chunk):
+            out[:, a:a + chunk], state = sosfilt(sos, x[:, a:a + chunk], axis=-1, zi=state)
+        return out
+
+    taps = 2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+    edge = 3 * taps
+    if n <= edge:
+        raise ValueError(f"zero-phase filtering needs more than {edge} samples")
+    first, last = np.asarray(x[:, :1]), np.asarray(x[:, -1:])
+    left = 2 * first - np.asarray(x[:, edge:0:-1])
+    right = 2 * last - np.asarray(x[:, -2:-(edge + 2):-1])
+
+    _, state = sosfilt(sos, left, axis=-1, zi=zi * left[:, :1])
+    for a in range(0, n, chunk):
+        out[:, a:a + chunk], state = sosfilt(sos, x[:, a:a + chunk], axis=-1, zi=state)
+    tail, _ = sosfilt(sos, right, axis=-1, zi=state)
+
+    # Backward, starting from the far end of the right extension
+    _, state = sosfilt(sos, tail[:, ::-1], axis=-1, zi=zi * tail[:, -1:])
+    for a in reversed(range(0, n, chunk)):
+        block, state = sosfilt(sos, np.asarray(out[:, a:a + chunk])[:, ::-1], axis=-1, zi=state)
+        out[:, a:a + chunk] = block[:, ::-1]
+    return out
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+# H1/H2 frequency response (transmissibility) estimates between a reference
+# channel and any number of response channels. Everything is read out of the
+# averaged CSD matrix (psd_engine.csd_matrix), so picking another reference or
+# other responses is indexing, not another pass over the segment FFTs.
+
+
+def frf_estimates(S, reference, responses):
+    # H1 = Sxy / Sxx is unbiased by noise on the responses, H2 = Syy / Syx by
+    # noise on the reference; coherence = H1 / H2. Returns H1, H2 and the
+    # coherence, each of shape (n_freq, len(responses)).
+    responses = list(responses)
+    Sxx = np.real(S[:, reference, reference])[:, None]
+    Syy = np.real(S[:, responses, responses])
+    Sxy = S[:, reference, responses]
+    Syx = S[:, responses, reference]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        H1 = Sxy / Sxx
+        H2 = Syy / Syx
+        coherence = np.abs(Sxy)**2 / (Sxx * Syy)
+    return np.nan_to_num(H1), np.nan_to_num(H2), np.nan_to_num(coherence)
+
+
+def frf_table(f, H1, H2, coherence, response_names):
+    table = pd.DataFrame({'frequency_hz': f})
+    for k, name in enumerate(response_names):
+        table[f'{name} H1 mag'] = np.abs(H1[:, k])
+        table[f'{name} H1 phase_deg'] = np.degrees(np.angle(H1[:, k]))
+        table[f'{name} H2 mag'] = np.abs(H2[:, k])
+        table[f'{name} H2 phase_deg'] = np.degrees(np.angle(H2[:, k]))
+        table[f'{name} coherence'] = coherence[:, k]
+    return table
@@ -1,15 +1,30 @@
+import time
+START = time.perf_counter()   # for the cold-start time, before any heavy import
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from scipy.signal import welch
-import concurrent.futures
-from docx import Document
-from docx.shared import Inches
+from plot_decimation import EnvelopeLine
+from pyramid import Pyramid
+from run_compare import RunLoader
+from session import save_session, load_session, pack_result, unpack_result
+from perf_trace import TRACE, make_event, now_us
+from perf_panel import PerfPanel, MemoryPanel
+from dataclasses import astuple, asdict
+from psd_engine import SpectralSettings, WINDOWS, DETRENDS, AVERAGES, SCALINGS, coherence_matrix
+from memory_telemetry import MEMORY, project_load_bytes, project_glevel_bytes, project_psd_bytes, project_csd_bytes
+from filters import FilterSpec, KINDS, RESPONSES
+from resampling import FACTORS
+from integration import QUANTITIES
+from channel_pages import PAGE_CHANNELS, page_count, page_range, page_text
 import os
-import tempfile
+import sys
+from collections import OrderedDict
+import numpy as np
+
+# Only what the window itself needs is imported here, so it shows quickly.
+# The analysis, plotting and report modules bring in pandas, scipy,
+# matplotlib and python-docx; they are imported in the methods that use
+# them, and the tabs are only built when they are first opened.
 
 class GLevelPSDApp(tk.Tk):
     def __init__(self):
@@ -18,28 +33,120 @@ class GLevelPSDApp(tk.Tk):
         self.title("G-Level and PSD Plotter")
         self.geometry("1000x800")
 
+        # Packed first so the notebook cannot squeeze it out of the window
+        self.perf_panel = PerfPanel(self)
+        self.perf_panel.pack(side=tk.BOTTOM, fill='x')
+        self.memory_panel = MemoryPanel(self)
+        self.memory_panel.pack(side=tk.BOTTOM, fill='x')
+
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill='both', expand=True)
 
         self.input_tab = ttk.Frame(self.notebook)
         self.glevel_tab = ttk.Frame(self.notebook)
         self.psd_tab = ttk.Frame(self.notebook)
+        self.channels_tab = ttk.Frame(self.notebook)
+        self.octave_tab = ttk.Frame(self.notebook)
+        self.coherence_tab = ttk.Frame(self.notebook)
+        self.frf_tab = ttk.Frame(self.notebook)
+        self.fdd_tab = ttk.Frame(self.notebook)
+        self.envelope_tab = ttk.Frame(self.notebook)
+        self.speed_tab = ttk.Frame(self.notebook)
+        self.segments_tab = ttk.Frame(self.notebook)
+        self.compare_tab = ttk.Frame(self.notebook)
 
         self.notebook.add(self.input_tab, text='Inputs')
         self.notebook.add(self.glevel_tab, text='G-Levels')
         self.notebook.add(self.psd_tab, text='PSD Plots')
+        self.notebook.add(self.channels_tab, text='Channels')
+        self.notebook.add(self.octave_tab, text='Octave Bands')
+        self.notebook.add(self.coherence_tab, text='Coherence')
+        self.notebook.add(self.frf_tab, text='FRF')
+        self.notebook.add(self.fdd_tab, text='Modes (FDD)')
+        self.notebook.add(self.envelope_tab, text='Envelope')
+        self.notebook.add(self.speed_tab, text='Speed Bins')
+        self.notebook.add(self.segments_tab, text='Segments')
+        self.notebook.add(self.compare_tab, text='Compare Runs')
 
         self.data = None
+        self.pyramid = None
+        self.record_path = None
+        self.raw_record = None   # (data, record_path) as loaded, before any filter
+        self.decimation = 1
+        self.active_filter = None
+        self.integration = ('acceleration', None)
+        self.unit = 'G'
         self.velocity_data = None
         self.sensitivity = None
         self.nperseg = None   
         self.sampling_freq = None
         self.selected_range = None
+        self.psd_result = None
+        self.psd_settings = None
+        self.octave_result = None
+        self.csd_result = None
+        self.csd_key = None
+        self.frf_result = None
+        self.fdd_result = None
+        self.envelope_cache = OrderedDict()  # least recently used first
+        self.envelope_result = None
+        self.speed_result = None
+        self.segments = None
+        self.channel_names = []
+        self.channel_page = 0        # only this page of channels is plotted
+        self.page_labels = []
+        self.glevel_view = None      # (scale, velocity, ylabel) of the plotted G-levels
+        self.channel_summary = None  # glevel_stats of every channel
+        self.channel_sort = None     # (column, descending) of the Channels table
+        self.glevel_pool = None
+        self.psd_pool = None
+        self.file_path = None
+        self.run_loader = RunLoader()
+        self.compare_runs = {}     # file path -> dict of data, record_path, pyramid, key, f, Pxx
+        self.compare_inputs_used = None
+        self.compare_lines = {}    # file path (None for the current run) -> (EnvelopeLine, PSD line)
+        self.compare_current = None  # (key, data, pyramid, f, Pxx) of the current run
         self.velocity_present = tk.BooleanVar()
 
+        # Only the Inputs tab is built up front, the others when first needed
+        self.tab_builders = {
+            self.glevel_tab: self.create_glevel_tab,
+            self.psd_tab: self.create_psd_tab,
+            self.channels_tab: self.create_channels_tab,
+            self.octave_tab: self.create_octave_tab,
+            self.coherence_tab: self.create_coherence_tab,
+            self.frf_tab: self.create_frf_tab,
+            self.fdd_tab: self.create_fdd_tab,
+            self.envelope_tab: self.create_envelope_tab,
+            self.speed_tab: self.create_speed_tab,
+            self.segments_tab: self.create_segments_tab,
+            self.compare_tab: self.create_compare_tab,
+        }
         self.create_input_tab()
-        self.create_glevel_tab()
-        self.create_psd_tab()
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.build_tab(self.nametowidget(self.notebook.select())))
+        self.register_memory_sources()
+
+    def build_tab(self, tab):
+        builder = self.tab_builders.pop(tab, None)
+        if builder is not None:
+            with TRACE.stage('build_tab', tab=self.notebook.tab(tab, 'text')):
+                builder()
+
+    def build_all_tabs(self):
+        for tab in list(self.tab_builders):
+            self.build_tab(tab)
+
+    def report_startup(self, start, exit_after=False):
+        # Cold start: from the first line of this module to the window being
+        # up and the event loop idle, so the first click is handled
+        def done():
+            duration = time.perf_counter() - start
+            TRACE.add_events([make_event('cold_start', now_us() - int(duration * 1e6), duration,
+                                         modules=len(sys.modules))])
+            if exit_after:
+                print(f"cold_start_s={duration:.3f}", flush=True)
+                self.destroy()
+        self.after_idle(done)
 
     def create_input_tab(self):
         ttk.Label(self.input_tab, text="Sensor Sensitivity:").grid(row=0, column=0, padx=10, pady=10)
@@ -65,6 +172,204 @@ class GLevelPSDApp(tk.Tk):
         ttk.Button(self.input_tab, text="Plot PSD", command=self.plot_psd_from_selection).grid(row=6, column=0, columnspan=2, padx=10, pady=10)
         ttk.Button(self.input_tab, text="Export Plots", command=self.export_plots).grid(row=7, column=0, columnspan=2, padx=10, pady=10)
 
+        ttk.Label(self.input_tab, text="Memory budget (MB):").grid(row=8, column=0, padx=10, pady=10)
+        self.memory_budget_entry = ttk.Entry(self.input_tab)
+        self.memory_budget_entry.insert(0, str(MEMORY.budget_bytes // 2**20))
+        self.memory_budget_entry.grid(row=8, column=1, padx=10, pady=10)
+
+        ttk.Label(self.input_tab, text="Analysis server (optional):").grid(row=9, column=0, padx=10, pady=10)
+        self.server_entry = ttk.Entry(self.input_tab)
+        self.server_entry.grid(row=9, column=1, padx=10, pady=10)
+
+        ttk.Button(self.input_tab, text="Save Session", command=self.save_session).grid(row=10, column=0, padx=10, pady=10)
+        ttk.Button(self.input_tab, text="Open Session", command=self.open_session).grid(row=10, column=1, padx=10, pady=10)
+
+        self.create_spectral_settings()
+        self.create_filter_settings()
+
+    def create_spectral_settings(self):
+        frame = ttk.LabelFrame(self.input_tab, text="Spectral Settings")
+        frame.grid(row=0, column=2, rowspan=9, padx=10, pady=10, sticky='n')
+        defaults = SpectralSettings()
+
+        self.window_var = tk.StringVar(value=defaults.window)
+        self.overlap_var = tk.StringVar(value=str(defaults.overlap))
+        self.nfft_var = tk.StringVar(value="")
+        self.detrend_var = tk.StringVar(value=defaults.detrend)
+        self.average_var = tk.StringVar(value=defaults.average)
+        self.scaling_var = tk.StringVar(value=defaults.scaling)
+        self.onesided_var = tk.BooleanVar(value=defaults.onesided)
+
+        rows = [
+            ("Window:", ttk.Combobox(frame, textvariable=self.window_var, values=WINDOWS, state='readonly')),
+            ("Overlap (%):", ttk.Entry(frame, textvariable=self.overlap_var)),
+            ("nfft (blank = nperseg):", ttk.Entry(frame, textvariable=self.nfft_var)),
+            ("Detrend:", ttk.Combobox(frame, textvariable=self.detrend_var, values=DETRENDS, state='readonly')),
+            ("Averaging:", ttk.Combobox(frame, textvariable=self.average_var, values=AVERAGES, state='readonly')),
+            ("Scaling:", ttk.Combobox(frame, textvariable=self.scaling_var, values=SCALINGS, state='readonly')),
+        ]
+        for row, (text, widget) in enumerate(rows):
+            ttk.Label(frame, text=text).grid(row=row, column=0, padx=5, pady=5, sticky='w')
+            widget.grid(row=row, column=1, padx=5, pady=5)
+        ttk.Checkbutton(frame, text="One-sided spectrum", variable=self.onesided_var).grid(row=len(rows), column=0, columnspan=2, padx=5, pady=5)
+
+        # nfft actually used, after rounding up to a fast FFT length
+        self.fft_length_label = ttk.Label(frame, text="")
+        self.fft_length_label.grid(row=len(rows) + 1, column=0, columnspan=2, padx=5, pady=5)
+
+    def create_filter_settings(self):
+        frame = ttk.LabelFrame(self.input_tab, text="Filter")
+        frame.grid(row=0, column=3, rowspan=9, padx=10, pady=10, sticky='n')
+        defaults = FilterSpec()
+
+        self.filter_kind_var = tk.StringVar(value=defaults.kind)
+        self.filter_response_var = tk.StringVar(value=defaults.response)
+        self.filter_cutoff_var = tk.StringVar(value=", ".join(f"{c:g}" for c in defaults.cutoff))
+        self.filter_order_var = tk.StringVar(value=str(defaults.order))
+        self.filter_ripple_var = tk.StringVar(value=str(defaults.ripple))
+        self.filter_zero_phase_var = tk.BooleanVar(value=defaults.zero_phase)
+
+        rows = [
+            ("Type:", ttk.Combobox(frame, textvariable=self.filter_kind_var, values=KINDS, state='readonly', width=12)),
+            ("Response:", ttk.Combobox(frame, textvariable=self.filter_response_var, values=RESPONSES, state='readonly', width=12)),
+            ("Cutoff(s) [Hz]:", ttk.Entry(frame, textvariable=self.filter_cutoff_var, width=14)),
+            ("Order:", ttk.Entry(frame, textvariable=self.filter_order_var, width=14)),
+            ("Ripple [dB]:", ttk.Entry(frame, textvariable=self.filter_ripple_var, width=14)),
+        ]
+        for row, (text, widget) in enumerate(rows):
+            ttk.Label(frame, text=text).grid(row=row, column=0, padx=5, pady=5, sticky='w')
+            widget.grid(row=row, column=1, padx=5, pady=5)
+        ttk.Checkbutton(frame, text="Zero phase", variable=self.filter_zero_phase_var).grid(row=len(rows), column=0, columnspan=2, padx=5, pady=5)
+        ttk.Button(frame, text="Apply Filter", command=self.apply_filter).grid(row=len(rows) + 1, column=0, padx=5, pady=5)
+        ttk.Button(frame, text="Remove Filter", command=self.use_raw_data).grid(row=len(rows) + 1, column=1, padx=5, pady=5)
+        self.filter_status_label = ttk.Label(frame, text="Showing unfiltered data")
+        self.filter_status_label.grid(row=len(rows) + 2, column=0, columnspan=2, padx=5, pady=5)
+
+        # Analyses that only need low frequencies can run on 5-25x fewer samples
+        ttk.Label(frame, text="Decimate by:").grid(row=len(rows) + 3, column=0, padx=5, pady=5, sticky='w')
+        self.decimation_var = tk.StringVar(value="1")
+        decimation_box = ttk.Combobox(frame, textvariable=self.decimation_var, values=[str(q) for q in FACTORS], state='readonly', width=12)
+        decimation_box.grid(row=len(rows) + 3, column=1, padx=5, pady=5)
+        decimation_box.bind("<<ComboboxSelected>>", lambda e: self.change_decimation())
+
+        ttk.Label(frame, text="Signal:").grid(row=len(rows) + 4, column=0, padx=5, pady=5, sticky='w')
+        self.quantity_var = tk.StringVar(value='acceleration')
+        quantity_box = ttk.Combobox(frame, textvariable=self.quantity_var, values=list(QUANTITIES), state='readonly', width=12)
+        quantity_box.grid(row=len(rows) + 4, column=1, padx=5, pady=5)
+        quantity_box.bind("<<ComboboxSelected>>", lambda e: self.change_quantity())
+        ttk.Label(frame, text="Integration high-pass [Hz]:").grid(row=len(rows) + 5, column=0, padx=5, pady=5, sticky='w')
+        self.integration_highpass_var = tk.StringVar(value="2")
+        ttk.Entry(frame, textvariable=self.integration_highpass_var, width=14).grid(row=len(rows) + 5, column=1, padx=5, pady=5)
+
+    def filter_spec(self):
+        return FilterSpec(
+            kind=self.filter_kind_var.get(),
+            response=self.filter_response_var.get(),
+            cutoff=tuple(float(c) for c in self.filter_cutoff_var.get().replace(',', ' ').split()),
+            order=int(self.filter_order_var.get()),
+            ripple=float(self.filter_ripple_var.get()),
+            zero_phase=self.filter_zero_phase_var.get(),
+        )
+
+    def prepare_data(self, decimation, spec, integration):
+        # The data everything runs on: the record as loaded, decimated, then
+        # filtered and integrated at the lower rate. Filters never stack up.
+        # integration is (quantity, high-pass cutoff). Raises ValueError.
+        from analysis import filter_record, decimate_record, integrate_record
+        data, record_path = decimate_record(*self.raw_record, decimation)
+        sampling_freq = float(self.sampling_freq_entry.get() or 0) / decimation
+        if spec is not None:
+            data, record_path = filter_record(data, record_path, spec, sampling_freq)
+        quantity, highpass = integration
+        if quantity != 'acceleration':
+            data, record_path = integrate_record(data, record_path, quantity, highpass, sampling_freq)
+        self.set_data(data, record_path)
+        self.decimation = decimation
+        self.active_filter = spec
+        self.integration = integration
+        self.unit = QUANTITIES[quantity][0]
+        self.filter_status_label.config(text=f"Showing {spec.response} {spec.kind} filtered {quantity}" if spec else f"Showing unfiltered {quantity}")
+
+    def apply_filter(self):
+        if self.raw_record is None:
+            messagebox.showerror("Data Error", "Please load the data file first.")
+            return
+        try:
+            self.prepare_data(self.decimation, self.filter_spec(), self.integration)
+        except ValueError as e:
+            messagebox.showerror("Filter", str(e) or "Please enter valid numbers for the filter.")
+
+    def use_raw_data(self):
+        if self.raw_record is not None:
+            self.prepare_data(self.decimation, None, self.integration)
+
+    def change_decimation(self):
+        if self.raw_record is None:
+            return
+        try:
+            self.prepare_data(int(self.decimation_var.get()), self.active_filter, self.integration)
+        except ValueError as e:
+            messagebox.showerror("Decimation", str(e))
+            self.decimation_var.set(str(self.decimation))
+
+    def change_quantity(self):
+        if self.raw_record is None:
+            return
+        try:
+            integration = (self.quantity_var.get(), float(self.integration_highpass_var.get()))
+            self.prepare_data(self.decimation, self.active_filter, integration)
+        except ValueError as e:
+            messagebox.showerror("Integration", str(e) or "Please enter a valid high-pass cutoff.")
+            self.quantity_var.set(self.integration[0])
+
+    def set_data(self, data, record_path):
+        # Everything derived from the previous data is dropped
+        from analysis import channel_count, channel_label
+        self.data = data
+        self.record_path = record_path
+        self.pyramid = Pyramid.open(record_path) if record_path is not None else None
+        self.csd_result = None
+        self.envelope_cache.clear()
+        self.channel_summary = None
+        self.update_channel_lists([channel_label(k) for k in range(channel_count(self.data))])
+        self.update_page_labels()
+        self.show_channel_summary()
+
+    def spectral_settings(self):
+        nfft = self.nfft_var.get().strip()
+        settings = SpectralSettings(
+            nperseg=int(self.nperseg_entry.get()),
+            window=self.window_var.get(),
+            overlap=float(self.overlap_var.get()),
+            nfft=int(nfft) if nfft else None,
+            detrend=self.detrend_var.get(),
+            average=self.average_var.get(),
+            scaling=self.scaling_var.get(),
+            onesided=self.onesided_var.get(),
+        )
+        settings.validate()
+        self.fft_length_label.config(text=f"FFT length used: {settings.fft_length()}")
+        return settings
+
+    def register_memory_sources(self):
+        MEMORY.add_source('records', lambda: [('vibration data', self.data), ('velocity data', self.velocity_data)] +
+                                             ([('unfiltered data', self.raw_record[0])] if self.raw_record and self.raw_record[0] is not self.data else []) +
+                                             [(f'compared run {os.path.basename(path)}', run.get('data')) for path, run in self.compare_runs.items()])
+        MEMORY.add_source('derived', lambda: [('PSD spectra', self.psd_result), ('CSD matrix', self.csd_result), ('FRF', self.frf_result), ('FDD', self.fdd_result), ('speed-binned PSD', self.speed_result)] +
+                                             [(f'envelope spectrum {key[1][0]:g}-{key[1][1]:g} Hz', result) for key, result in self.envelope_cache.items()])
+        MEMORY.add_source('caches', lambda: [(f'pyramid level {k}', level) for k, level in enumerate(self.pyramid.levels)] if self.pyramid else [])
+        MEMORY.add_source('figures', lambda: [(f'G-level figure {k + 1}', fig) for k, fig in enumerate(self.glevel_pool.figures() if self.glevel_pool else [])] +
+                                             [(f'PSD figure {k + 1}', fig) for k, fig in enumerate(self.psd_pool.figures() if self.psd_pool else [])])
+
+    def confirm_memory(self, projected_bytes, operation):
+        # Asks before going ahead with an operation projected to exceed the budget
+        try:
+            MEMORY.budget_bytes = int(float(self.memory_budget_entry.get()) * 2**20)
+        except ValueError:
+            pass
+        warning = MEMORY.check(projected_bytes, operation)
+        return warning is None or messagebox.askyesno("Memory Warning", warning + "\n\nContinue anyway?")
+
     def toggle_velocity_profile(self):
         if self.velocity_present.get():
             self.load_velocity_button.config(state=tk.NORMAL)
@@ -73,6 +378,8 @@ class GLevelPSDApp(tk.Tk):
             self.velocity_data = None  # Clear velocity data if checkbox is unchecked
 
     def create_glevel_tab(self):
+        from figure_pool import FigurePool
+        self.create_page_controls(self.glevel_tab)
         self.glevel_canvas_frame = tk.Canvas(self.glevel_tab)
         self.glevel_canvas_frame.pack(side=tk.LEFT, fill='both', expand=True)
         self.scrollbar = ttk.Scrollbar(self.glevel_tab, orient="vertical", command=self.glevel_canvas_frame.yview)
@@ -80,15 +387,15 @@ class GLevelPSDApp(tk.Tk):
         self.glevel_canvas = ttk.Frame(self.glevel_canvas_frame)
 
         self.glevel_canvas_frame.create_window((0, 0), window=self.glevel_canvas, anchor="nw")
-        self.glevel_canvas_frame.configure(yscrollcommand=self.scrollbar.set)
 
         self.glevel_canvas.bind("<Configure>", lambda e: self.glevel_canvas_frame.configure(scrollregion=self.glevel_canvas_frame.bbox("all")))
 
-        self.glevel_plots = []
-        self.glevel_figs = []
-        self.glevel_axs = []
+        # Only the figures near the visible part of the tab get a Tk canvas
+        self.glevel_pool = FigurePool(self.glevel_canvas, self.glevel_canvas_frame, self.scrollbar, figsize=(10, 10))
 
     def create_psd_tab(self):
+        from figure_pool import FigurePool
+        self.create_page_controls(self.psd_tab)
         self.psd_canvas_frame = tk.Canvas(self.psd_tab)
         self.psd_canvas_frame.pack(side=tk.LEFT, fill='both', expand=True)
         self.scrollbar_psd = ttk.Scrollbar(self.psd_tab, orient="vertical", command=self.psd_canvas_frame.yview)
@@ -96,190 +403,1357 @@ class GLevelPSDApp(tk.Tk):
         self.psd_canvas = ttk.Frame(self.psd_canvas_frame)
 
         self.psd_canvas_frame.create_window((0, 0), window=self.psd_canvas, anchor="nw")
-        self.psd_canvas_frame.configure(yscrollcommand=self.scrollbar_psd.set)
 
         self.psd_canvas.bind("<Configure>", lambda e: self.psd_canvas_frame.configure(scrollregion=self.psd_canvas_frame.bbox("all")))
 
-        self.psd_plots = []
-        self.psd_figs = []
-        self.psd_axs = []
+        self.psd_pool = FigurePool(self.psd_canvas, self.psd_canvas_frame, self.scrollbar_psd, figsize=(10, 8))
 
-    def load_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx")])
-        if file_path:
-            if file_path.endswith('.csv'):
-                self.data = self.load_csv_parallel(file_path)
-            elif file_path.endswith('.xlsx'):
-                self.data = self.load_excel_parallel(file_path)
-            messagebox.showinfo("File Loaded", "Vibration profile loaded successfully.")
+    def create_page_controls(self, tab):
+        # The G-level and PSD tabs show one page of channels, turned together
+        controls = ttk.Frame(tab)
+        controls.pack(side=tk.TOP, fill='x')
+        ttk.Button(controls, text="< Previous", command=lambda: self.show_channel_page(self.channel_page - 1)).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(controls, text="Next >", command=lambda: self.show_channel_page(self.channel_page + 1)).pack(side=tk.LEFT, padx=5)
+        label = ttk.Label(controls)
+        label.pack(side=tk.LEFT, padx=10)
+        self.page_labels.append(label)
+        self.update_page_labels()
+
+    def update_page_labels(self):
+        channels = len(self.channel_names)
+        self.channel_page = min(self.channel_page, page_count(channels) - 1)
+        for label in self.page_labels:
+            label.config(text=page_text(self.channel_page, channels) if channels else "No data loaded")
+
+    CHANNEL_COLUMNS = ('page', 'max_g', 'max_time', 'min_g', 'min_time', 'rms_g', 'psd_peak_hz', 'psd_peak')
+
+    def create_channels_tab(self):
+        # Every channel of the run with its levels; the figures only ever
+        # hold one page, double-clicking a channel turns to its page
+        controls = ttk.Frame(self.channels_tab)
+        controls.pack(fill='x')
+        ttk.Button(controls, text="Summarise All Channels", command=self.compute_channel_summary).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(controls, text="Export Table", command=self.export_channel_summary).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Click a heading to sort, double-click a channel to show its page").pack(side=tk.LEFT, padx=10)
+
+        self.channel_table = ttk.Treeview(self.channels_tab, columns=self.CHANNEL_COLUMNS, selectmode='browse')
+        self.channel_table.heading('#0', text="Channel", command=lambda: self.sort_channel_table('channel'))
+        for column, text in zip(self.CHANNEL_COLUMNS, ("Page", "Max", "Max at [s]", "Min", "Min at [s]", "RMS", "PSD peak [Hz]", "PSD peak")):
+            self.channel_table.heading(column, text=text, command=lambda c=column: self.sort_channel_table(c))
+            self.channel_table.column(column, width=100, anchor='e')
+        scrollbar = ttk.Scrollbar(self.channels_tab, orient="vertical", command=self.channel_table.yview)
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.channel_table.configure(yscrollcommand=scrollbar.set)
+        self.channel_table.pack(fill='both', expand=True)
+        self.channel_table.bind("<Double-1>", lambda e: self.open_channel_page())
+        self.show_channel_summary()
+
+    def create_octave_tab(self):
+        from figure_pool import embed_figure
+        from octave_bands import FRACTIONS
+        controls = ttk.Frame(self.octave_tab)
+        controls.pack(fill='x')
+        ttk.Label(controls, text="Bandwidth:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.fraction_var = tk.StringVar(value='1/3')
+        ttk.Combobox(controls, textvariable=self.fraction_var, values=list(FRACTIONS), state='readonly', width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Channel:").pack(side=tk.LEFT, padx=5)
+        self.octave_channel_var = tk.StringVar()
+        self.octave_channel_box = ttk.Combobox(controls, textvariable=self.octave_channel_var, state='readonly', width=20)
+        self.octave_channel_box.pack(side=tk.LEFT, padx=5)
+        self.octave_channel_box.bind("<<ComboboxSelected>>", lambda e: self.draw_octave_bands())
+        ttk.Button(controls, text="Compute Bands", command=self.compute_octave_bands).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Export Table", command=self.export_octave_table).pack(side=tk.LEFT, padx=5)
+
+        self.octave_fig, self.octave_ax, self.octave_canvas = embed_figure(self.octave_tab, figsize=(10, 6))
+
+    def compute_octave_bands(self):
+        # Works from the PSDs of the last Plot PSD, nothing is recomputed here
+        from analysis import channel_label
+        from octave_bands import FRACTIONS, octave_bands
+        if self.psd_result is None:
+            messagebox.showerror("Data Error", "Please plot the PSDs first.")
+            return
+        if self.psd_settings.scaling != 'density' or not self.psd_settings.onesided:
+            messagebox.showerror("Spectral Settings", "Octave bands need a one-sided PSD with density scaling.")
+            return
+
+        f, Pxx = self.psd_result
+        fraction = self.fraction_var.get()
+        with TRACE.stage('octave_bands', samples=Pxx.size):
+            centres, lower, upper, rms, band_psd = octave_bands(f, Pxx, FRACTIONS[fraction])
+        names = [channel_label(k) for k in range(Pxx.shape[1])]
+        self.octave_result = (fraction, centres, lower, upper, rms, names)
 
-    def load_csv_parallel(self, file_path):
-        chunksize = 100000  # Adjust this based on available memory
-        num_cores = os.cpu_count()
+        self.octave_channel_box.config(values=names)
+        if self.octave_channel_var.get() not in names:
+            self.octave_channel_var.set(names[0])
+        self.draw_octave_bands()
+        self.notebook.select(self.octave_tab)
 
-        def read_chunk(chunk):
-            return chunk
+    def draw_octave_bands(self):
+        if self.octave_result is None:
+            return
+        fraction, centres, lower, upper, rms, names = self.octave_result
+        k = names.index(self.octave_channel_var.get())
 
-        with concurrent.futures.ProcessPoolExecutor(max_workers=num_cores) as executor:
-            chunks = pd.read_csv(file_path, chunksize=chunksize)
-            df_list = list(executor.map(read_chunk, chunks))
+        ax = self.octave_ax
+        ax.clear()
+        ax.bar(lower, rms[:, k], width=upper - lower, align='edge', edgecolor='black')
+        ax.set_xscale('log')
+        ax.set_title(f'{names[k]} - {fraction} Octave Bands')
+        ax.set_xlabel('Frequency [Hz]')
+        ax.set_ylabel(f'Band RMS [{self.unit}]')
+        ax.grid(True, which='both', axis='x', alpha=0.3)
+        self.octave_canvas.draw_idle()
 
-        return pd.concat(df_list, ignore_index=True)
+    def export_octave_table(self):
+        from octave_bands import band_table
+        if self.octave_result is None:
+            messagebox.showerror("Data Error", "Please compute the octave bands first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            fraction, centres, lower, upper, rms, names = self.octave_result
+            band_table(centres, lower, upper, rms, names).to_csv(save_path, index=False)
+
+    def create_coherence_tab(self):
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.coherence_tab)
+        controls.pack(fill='x')
+        ttk.Button(controls, text="Compute Coherence", command=self.compute_coherence).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(controls, text="Band [Hz]:").pack(side=tk.LEFT, padx=5)
+        self.coherence_fmin_entry = ttk.Entry(controls, width=8)
+        self.coherence_fmin_entry.pack(side=tk.LEFT)
+        ttk.Label(controls, text="to").pack(side=tk.LEFT, padx=2)
+        self.coherence_fmax_entry = ttk.Entry(controls, width=8)
+        self.coherence_fmax_entry.pack(side=tk.LEFT)
+        for entry in (self.coherence_fmin_entry, self.coherence_fmax_entry):
+            entry.bind("<Return>", lambda e: self.draw_coherence())
+
+        ttk.Label(controls, text="Pair:").pack(side=tk.LEFT, padx=5)
+        self.pair_vars = (tk.StringVar(), tk.StringVar())
+        self.pair_boxes = []
+        for var in self.pair_vars:
+            box = ttk.Combobox(controls, textvariable=var, state='readonly', width=16)
+            box.pack(side=tk.LEFT, padx=2)
+            box.bind("<<ComboboxSelected>>", lambda e: self.draw_coherence())
+            self.pair_boxes.append(box)
+
+        self.coherence_fig, (self.coherence_map_ax, self.coherence_pair_ax), self.coherence_canvas = \
+            embed_figure(self.coherence_tab, figsize=(10, 10), nrows=2)
+        self.coherence_fig.set_layout_engine('constrained')
+        self.coherence_colorbar = None
+        # Clicking a cell of the heatmap picks that pair
+        self.coherence_canvas.mpl_connect('button_press_event', self.pick_coherence_pair)
+
+    def cross_spectra(self):
+        # The averaged CSD matrix of the selected range, shared by the
+        # Coherence and FRF tabs. Only recomputed when the data, the range or
+        # the inputs changed. None once an error has been shown.
+        from analysis import channel_count, select_range, channel_label, compute_csd
+        if self.data is None:
+            messagebox.showerror("Data Error", "Please load the data file first.")
+            return None
+        settings = self.read_spectral_inputs()
+        if settings is None:
+            return None
+
+        channels = channel_count(self.data)
+        key = (id(self.data), self.selected_range, channels, self.sensitivity, self.sampling_freq, astuple(settings))
+        if self.csd_result is not None and key == self.csd_key:
+            return self.csd_result
+
+        data_subset = select_range(self.data, self.selected_range)
+        if not self.confirm_memory(project_csd_bytes(len(data_subset), channels, settings), "Computing the cross-spectra"):
+            return None
+        with TRACE.stage('cross_spectra', samples=len(data_subset) * channels):
+            try:
+                f, S = compute_csd(data_subset.iloc[:, 1:channels + 1].to_numpy(), self.sensitivity, self.sampling_freq, settings)
+            except ValueError as e:
+                messagebox.showerror("Spectral Settings", str(e))
+                return None
+            names = [channel_label(k) for k in range(channels)]
+            self.csd_result = (f, S, coherence_matrix(S), names)
+            self.csd_key = key
+        return self.csd_result
+
+    def compute_coherence(self):
+        if self.cross_spectra() is None:
+            return
+        names = self.csd_result[3]
+
+        for box in self.pair_boxes:
+            box.config(values=names)
+        for var, default in zip(self.pair_vars, (names[0], names[min(1, len(names) - 1)])):
+            if var.get() not in names:
+                var.set(default)
+        self.draw_coherence()
+        self.notebook.select(self.coherence_tab)
+
+    def coherence_band(self, f):
+        # Frequencies averaged into the heatmap, blank limits mean no limit
+        try:
+            fmin = float(self.coherence_fmin_entry.get() or -np.inf)
+            fmax = float(self.coherence_fmax_entry.get() or np.inf)
+        except ValueError:
+            fmin, fmax = -np.inf, np.inf
+        band = (f >= fmin) & (f <= fmax)
+        return band if band.any() else np.ones_like(f, dtype=bool)
+
+    def draw_coherence(self):
+        if self.csd_result is None:
+            return
+        f, S, C, names = self.csd_result
+        band = self.coherence_band(f)
+        i, j = (names.index(var.get()) for var in self.pair_vars)
+
+        if self.coherence_colorbar is not None:
+            self.coherence_colorbar.remove()
+        ax = self.coherence_map_ax
+        ax.clear()
+        image = ax.imshow(C[band].mean(axis=0), vmin=0, vmax=1, cmap='viridis')
+        self.coherence_colorbar = self.coherence_fig.colorbar(image, ax=ax, label='Mean coherence')
+        ax.set_xticks(range(len(names)), names, rotation=90, fontsize=6)
+        ax.set_yticks(range(len(names)), names, fontsize=6)
+        ax.plot(j, i, marker='s', markersize=8, markerfacecolor='none', markeredgecolor='red')
+        ax.set_title(f'Coherence {f[band].min():.1f} - {f[band].max():.1f} Hz')
+
+        order = np.argsort(f)
+        ax = self.coherence_pair_ax
+        ax.clear()
+        ax.plot(f[order], C[order, i, j])
+        ax.axvspan(f[band].min(), f[band].max(), color='gray', alpha=0.15)
+        ax.set_ylim(0, 1.05)
+        ax.set_title(f'{names[i]} / {names[j]}')
+        ax.set_xlabel('Frequency [Hz]')
+        ax.set_ylabel('Coherence')
+        ax.grid(True)
+        self.coherence_canvas.draw_idle()
+
+    def pick_coherence_pair(self, event):
+        if self.csd_result is None or event.inaxes is not self.coherence_map_ax:
+            return
+        names = self.csd_result[3]
+        i, j = int(round(event.ydata)), int(round(event.xdata))
+        if 0 <= i < len(names) and 0 <= j < len(names):
+            self.pair_vars[0].set(names[i])
+            self.pair_vars[1].set(names[j])
+            self.draw_coherence()
+
+    def create_frf_tab(self):
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.frf_tab)
+        controls.pack(side=tk.LEFT, fill='y')
+        ttk.Label(controls, text="Reference:").pack(anchor='w', padx=5, pady=(5, 0))
+        self.frf_reference_var = tk.StringVar()
+        self.frf_reference_box = ttk.Combobox(controls, textvariable=self.frf_reference_var, state='readonly', width=16)
+        self.frf_reference_box.pack(padx=5)
+        ttk.Label(controls, text="Responses:").pack(anchor='w', padx=5, pady=(5, 0))
+        self.frf_response_list = tk.Listbox(controls, selectmode=tk.MULTIPLE, exportselection=False, height=24, width=18)
+        self.frf_response_list.pack(padx=5)
+        ttk.Button(controls, text="Compute FRF", command=self.compute_frf).pack(fill='x', padx=5, pady=5)
+        ttk.Button(controls, text="Export Table", command=self.export_frf_table).pack(fill='x', padx=5)
+
+        plot_area = ttk.Frame(self.frf_tab)
+        plot_area.pack(side=tk.LEFT, fill='both', expand=True)
+        self.frf_fig, self.frf_axs, self.frf_canvas = embed_figure(plot_area, figsize=(10, 10), nrows=3)
+        self.frf_fig.set_layout_engine('constrained')
+        if self.channel_names:
+            self.update_channel_lists(self.channel_names)
+
+    def update_channel_lists(self, names):
+        # Keeps the picks that still exist when the channel list changes.
+        # Tabs not built yet get the names when they are built.
+        self.channel_names = names
+        listboxes = []
+        if self.frf_tab not in self.tab_builders:
+            self.frf_reference_box.config(values=names)
+            if self.frf_reference_var.get() not in names:
+                self.frf_reference_var.set(names[0])
+            listboxes.append(self.frf_response_list)
+        if self.envelope_tab not in self.tab_builders:
+            listboxes.append(self.envelope_channel_list)
+        for listbox in listboxes:
+            if list(listbox.get(0, tk.END)) == names:
+                continue
+            listbox.delete(0, tk.END)
+            for name in names:
+                listbox.insert(tk.END, name)
+
+    def compute_frf(self):
+        from frf import frf_estimates
+        if self.cross_spectra() is None:
+            return
+        f, S, C, names = self.csd_result
+        self.update_channel_lists(names)
+
+        reference = names.index(self.frf_reference_var.get())
+        responses = [k for k in self.frf_response_list.curselection() if k != reference]
+        if not responses:
+            messagebox.showinfo("FRF", "Pick one or more response channels other than the reference.")
+            return
+        H1, H2, coherence = frf_estimates(S, reference, responses)
+        self.frf_result = (f, H1, H2, coherence, [names[k] for k in responses])
+        self.draw_frf(names[reference])
+        self.notebook.select(self.frf_tab)
+
+    def draw_frf(self, reference_name):
+        f, H1, H2, coherence, response_names = self.frf_result
+        order = np.argsort(f)
+        magnitude_ax, phase_ax, coherence_ax = self.frf_axs
+        for ax in self.frf_axs:
+            ax.clear()
+        for k, name in enumerate(response_names):
+            line, = magnitude_ax.semilogy(f[order], np.abs(H1[order, k]), label=f'{name} H1')
+            magnitude_ax.semilogy(f[order], np.abs(H2[order, k]), linestyle='--', color=line.get_color(), label=f'{name} H2')
+            phase_ax.plot(f[order], np.degrees(np.angle(H1[order, k])), color=line.get_color())
+            coherence_ax.plot(f[order], coherence[order, k], color=line.get_color())
+
+        magnitude_ax.set_title(f'Transmissibility from {reference_name}')
+        magnitude_ax.set_ylabel('|H| [G/G]')
+        magnitude_ax.legend(fontsize=6, ncol=2)
+        phase_ax.set_ylabel('H1 phase [deg]')
+        phase_ax.set_ylim(-180, 180)
+        coherence_ax.set_ylabel('Coherence')
+        coherence_ax.set_ylim(0, 1.05)
+        coherence_ax.set_xlabel('Frequency [Hz]')
+        for ax in self.frf_axs:
+            ax.grid(True)
+        self.frf_canvas.draw_idle()
+
+    def export_frf_table(self):
+        from frf import frf_table
+        if self.frf_result is None:
+            messagebox.showerror("Data Error", "Please compute the FRF first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            frf_table(*self.frf_result).to_csv(save_path, index=False)
+
+    def create_fdd_tab(self):
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.fdd_tab)
+        controls.pack(fill='x')
+        ttk.Button(controls, text="Find Modes", command=self.compute_fdd).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(controls, text="Modes:").pack(side=tk.LEFT, padx=5)
+        self.fdd_count_entry = ttk.Entry(controls, width=4)
+        self.fdd_count_entry.insert(0, "5")
+        self.fdd_count_entry.pack(side=tk.LEFT)
+        ttk.Label(controls, text="Band [Hz]:").pack(side=tk.LEFT, padx=5)
+        self.fdd_fmin_entry = ttk.Entry(controls, width=8)
+        self.fdd_fmin_entry.pack(side=tk.LEFT)
+        ttk.Label(controls, text="to").pack(side=tk.LEFT, padx=2)
+        self.fdd_fmax_entry = ttk.Entry(controls, width=8)
+        self.fdd_fmax_entry.pack(side=tk.LEFT)
+        ttk.Label(controls, text="Shape:").pack(side=tk.LEFT, padx=5)
+        self.fdd_mode_var = tk.StringVar()
+        self.fdd_mode_box = ttk.Combobox(controls, textvariable=self.fdd_mode_var, state='readonly', width=18)
+        self.fdd_mode_box.pack(side=tk.LEFT)
+        self.fdd_mode_box.bind("<<ComboboxSelected>>", lambda e: self.draw_fdd())
+        ttk.Button(controls, text="Export Modes", command=self.export_mode_shapes).pack(side=tk.LEFT, padx=5)
+
+        self.fdd_fig, self.fdd_axs, self.fdd_canvas = embed_figure(self.fdd_tab, figsize=(10, 10), nrows=2)
+        self.fdd_fig.set_layout_engine('constrained')
+
+    def compute_fdd(self):
+        from fdd import decompose, pick_peaks, mode_shapes
+        try:
+            count = int(self.fdd_count_entry.get())
+            fmin = float(self.fdd_fmin_entry.get()) if self.fdd_fmin_entry.get().strip() else None
+            fmax = float(self.fdd_fmax_entry.get()) if self.fdd_fmax_entry.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter valid numbers for the mode count and band.")
+            return
+        if self.cross_spectra() is None:
+            return
+        f, S, C, names = self.csd_result
+
+        with TRACE.stage('fdd', samples=S.size):
+            singular, vectors = decompose(S)
+            peaks = pick_peaks(f, singular[:, 0], count, fmin, fmax)
+        if len(peaks) == 0:
+            messagebox.showinfo("Modes", "No peaks found in the first singular value.")
+            return
+        self.fdd_result = (f, singular, peaks, mode_shapes(vectors, peaks))
+
+        labels = [f'Mode {m + 1} - {f[p]:.1f} Hz' for m, p in enumerate(peaks)]
+        self.fdd_mode_box.config(values=labels)
+        self.fdd_mode_var.set(labels[0])
+        self.draw_fdd()
+        self.notebook.select(self.fdd_tab)
+
+    def draw_fdd(self):
+        from fdd import mode_table
+        if self.fdd_result is None:
+            return
+        f, singular, peaks, shapes = self.fdd_result
+        mode = self.fdd_mode_box.current() if self.fdd_mode_box.current() >= 0 else 0
+        values_ax, shape_ax = self.fdd_axs
+        values_ax.clear()
+        shape_ax.clear()
+
+        order = np.argsort(f)
+        for k in range(min(3, singular.shape[1])):
+            values_ax.semilogy(f[order], singular[order, k], label=f'Singular value {k + 1}')
+        values_ax.plot(f[peaks], singular[peaks, 0], 'rv')
+        for m, p in enumerate(peaks):
+            values_ax.annotate(f'{m + 1}', (f[p], singular[p, 0]), textcoords='offset points', xytext=(0, 6), ha='center')
+        values_ax.set_xlabel('Frequency [Hz]')
+        values_ax.set_ylabel(f'Singular value of {SpectralSettings().ylabel(self.unit)}')
+        values_ax.legend()
+        values_ax.grid(True)
+
+        table = mode_table(f, peaks[mode:mode + 1], shapes[mode:mode + 1])
+        sensors = table['sensor'].to_numpy()
+        for offset, axis in zip((-0.25, 0, 0.25), ('x', 'y', 'z')):
+            shape_ax.bar(sensors + offset, table[axis].fillna(0), width=0.25, label=axis.upper())
+        shape_ax.axhline(0, color='black', linewidth=0.8)
+        shape_ax.set_xticks(sensors, [f'Sensor {s}' for s in sensors])
+        shape_ax.set_ylabel('Deflection')
+        shape_ax.set_ylim(-1.1, 1.1)
+        shape_ax.set_title(f'Mode {mode + 1} at {f[peaks[mode]]:.1f} Hz')
+        shape_ax.legend()
+        self.fdd_canvas.draw_idle()
+
+    def export_mode_shapes(self):
+        from fdd import mode_table
+        if self.fdd_result is None:
+            messagebox.showerror("Data Error", "Please find the modes first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            f, singular, peaks, shapes = self.fdd_result
+            mode_table(f, peaks, shapes).to_csv(save_path, index=False)
+
+    def create_envelope_tab(self):
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.envelope_tab)
+        controls.pack(side=tk.LEFT, fill='y')
+        entries = {}
+        for text, default in (("Band low [Hz]:", "2000"), ("Band high [Hz]:", "5000"), ("Show up to [Hz]:", "500")):
+            ttk.Label(controls, text=text).pack(anchor='w', padx=5, pady=(5, 0))
+            entries[text] = ttk.Entry(controls, width=10)
+            entries[text].insert(0, default)
+            entries[text].pack(anchor='w', padx=5)
+        self.envelope_low_entry, self.envelope_high_entry, self.envelope_fmax_entry = entries.values()
+        ttk.Label(controls, text="Channels:").pack(anchor='w', padx=5, pady=(5, 0))
+        self.envelope_channel_list = tk.Listbox(controls, selectmode=tk.MULTIPLE, exportselection=False, height=24, width=18)
+        self.envelope_channel_list.pack(padx=5)
+        ttk.Button(controls, text="Compute Envelope", command=self.compute_envelope).pack(fill='x', padx=5, pady=5)
+        ttk.Button(controls, text="Export Table", command=self.export_envelope_table).pack(fill='x', padx=5)
+
+        plot_area = ttk.Frame(self.envelope_tab)
+        plot_area.pack(side=tk.LEFT, fill='both', expand=True)
+        self.envelope_fig, self.envelope_ax, self.envelope_canvas = embed_figure(plot_area, figsize=(10, 6))
+        if self.channel_names:
+            self.update_channel_lists(self.channel_names)
+
+    # Envelope spectra of all channels are large, only the last few bands are kept
+    ENVELOPE_CACHE_SIZE = 4
+
+    def compute_envelope(self):
+        from analysis import select_range, channel_label, compute_envelope_spectrum
+        if self.data is None:
+            messagebox.showerror("Data Error", "Please load the data file first.")
+            return
+        try:
+            band = (float(self.envelope_low_entry.get()), float(self.envelope_high_entry.get()))
+            fmax = float(self.envelope_fmax_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter valid numbers for the band and display range.")
+            return
+        settings = self.read_spectral_inputs()
+        if settings is None:
+            return
+        channels = list(self.envelope_channel_list.curselection())
+        if not channels:
+            messagebox.showinfo("Envelope", "Pick one or more channels.")
+            return
+
+        # All channels of a band are computed together and kept, picking other
+        # channels of a band already computed costs nothing
+        key = (id(self.data), band, self.selected_range, self.sensitivity, self.sampling_freq, astuple(settings))
+        if key in self.envelope_cache:
+            self.envelope_cache.move_to_end(key)
+        else:
+            data_subset = select_range(self.data, self.selected_range)
+            try:
+                self.envelope_cache[key] = compute_envelope_spectrum(data_subset.iloc[:, 1:].to_numpy(),
+                                                                     self.sensitivity, self.sampling_freq, band, settings)
+            except ValueError as e:
+                messagebox.showerror("Envelope", str(e))
+                return
+            while len(self.envelope_cache) > self.ENVELOPE_CACHE_SIZE:
+                self.envelope_cache.popitem(last=False)
+        f, P = self.envelope_cache[key]
+        self.envelope_result = (f, P[:, channels], [channel_label(k) for k in channels], band, settings.ylabel(self.unit))
+        self.draw_envelope(fmax)
+        self.notebook.select(self.envelope_tab)
 
-    def load_excel_parallel(self, file_path):
-        # Specify engine for Excel files
-        return pd.read_excel(file_path, engine='openpyxl')
+    def draw_envelope(self, fmax):
+        f, P, names, band, ylabel = self.envelope_result
+        order = np.argsort(f)
+        shown = order[(f[order] >= 0) & (f[order] <= fmax)]
+        ax = self.envelope_ax
+        ax.clear()
+        for k, name in enumerate(names):
+            ax.plot(f[shown], P[shown, k], label=name)
+        ax.set_title(f'Envelope Spectrum, {band[0]:g} - {band[1]:g} Hz band')
+        ax.set_xlabel('Frequency [Hz]')
+        ax.set_ylabel(ylabel)
+        ax.legend(fontsize=8)
+        ax.grid(True)
+        self.envelope_canvas.draw_idle()
+
+    def export_envelope_table(self):
+        import pandas as pd
+        if self.envelope_result is None:
+            messagebox.showerror("Data Error", "Please compute the envelope spectrum first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            f, P, names, band, ylabel = self.envelope_result
+            table = pd.DataFrame({'frequency_hz': f})
+            for k, name in enumerate(names):
+                table[name] = P[:, k]
+            table.to_csv(save_path, index=False)
+
+    def create_speed_tab(self):
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.speed_tab)
+        controls.pack(fill='x')
+        ttk.Label(controls, text="Bin width [km/h]:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.speed_width_entry = ttk.Entry(controls, width=6)
+        self.speed_width_entry.insert(0, "10")
+        self.speed_width_entry.pack(side=tk.LEFT)
+        ttk.Button(controls, text="Compute", command=self.compute_speed_bins).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Channel:").pack(side=tk.LEFT, padx=5)
+        self.speed_channel_var = tk.StringVar()
+        self.speed_channel_box = ttk.Combobox(controls, textvariable=self.speed_channel_var, state='readonly', width=16)
+        self.speed_channel_box.pack(side=tk.LEFT)
+        self.speed_channel_box.bind("<<ComboboxSelected>>", lambda e: self.draw_speed_bins())
+        ttk.Button(controls, text="Export Table", command=self.export_speed_table).pack(side=tk.LEFT, padx=5)
+
+        self.speed_fig, self.speed_axs, self.speed_canvas = embed_figure(self.speed_tab, figsize=(10, 10), nrows=2)
+        self.speed_fig.set_layout_engine('constrained')
+        self.speed_colorbar = None
+
+    def compute_speed_bins(self):
+        from analysis import channel_count, select_range, channel_label, compute_speed_psd
+        if self.data is None or self.velocity_data is None:
+            messagebox.showerror("Data Error", "Please load the data file and the velocity profile first.")
+            return
+        try:
+            width = float(self.speed_width_entry.get())
+            if width <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a positive bin width.")
+            return
+        settings = self.read_spectral_inputs()
+        if settings is None:
+            return
+
+        data_subset = select_range(self.data, self.selected_range)
+        channels = channel_count(self.data)
+        velocity = (self.velocity_data.iloc[:, 0].to_numpy(), self.velocity_data.iloc[:, 1].to_numpy())
+        if not self.confirm_memory(project_psd_bytes(len(data_subset), channels, settings), "Computing the speed-binned PSDs"):
+            return
+        try:
+            f, edges, counts, P = compute_speed_psd(data_subset.iloc[:, 1:channels + 1].to_numpy(), data_subset.iloc[:, 0].to_numpy(),
+                                                    self.sensitivity, self.sampling_freq, settings, velocity, width)
+        except ValueError as e:
+            messagebox.showerror("Spectral Settings", str(e))
+            return
+        names = [channel_label(k) for k in range(channels)]
+        self.speed_result = (f, edges, counts, P, names, settings.ylabel(self.unit))
+
+        self.speed_channel_box.config(values=names)
+        if self.speed_channel_var.get() not in names:
+            self.speed_channel_var.set(names[0])
+        self.draw_speed_bins()
+        self.notebook.select(self.speed_tab)
+
+    def draw_speed_bins(self):
+        from matplotlib.colors import LogNorm
+        if self.speed_result is None:
+            return
+        f, edges, counts, P, names, ylabel = self.speed_result
+        k = names.index(self.speed_channel_var.get())
+        order = np.argsort(f)
+        map_ax, lines_ax = self.speed_axs
+
+        if self.speed_colorbar is not None:
+            self.speed_colorbar.remove()
+        map_ax.clear()
+        level = np.ma.masked_invalid(P[:, order, k])
+        positive = level[level > 0]
+        norm = LogNorm(vmin=positive.min(), vmax=positive.max()) if positive.count() else None
+        df = f[order][1] - f[order][0]
+        f_edges = np.append(f[order] - df / 2, f[order][-1] + df / 2)
+        mesh = map_ax.pcolormesh(f_edges, edges, level, shading='flat', norm=norm)
+        self.speed_colorbar = self.speed_fig.colorbar(mesh, ax=map_ax, label=ylabel)
+        map_ax.set_xlabel('Frequency [Hz]')
+        map_ax.set_ylabel('Speed [km/h]')
+        map_ax.set_title(names[k])
+
+        lines_ax.clear()
+        for b in np.flatnonzero(counts):
+            lines_ax.semilogy(f[order], P[b, order, k], label=f'{edges[b]:g}-{edges[b + 1]:g} km/h ({counts[b]})')
+        lines_ax.set_xlabel('Frequency [Hz]')
+        lines_ax.set_ylabel(ylabel)
+        lines_ax.legend(fontsize=7)
+        lines_ax.grid(True)
+        self.speed_canvas.draw_idle()
+
+    def export_speed_table(self):
+        from speed_bins import speed_table
+        if self.speed_result is None:
+            messagebox.showerror("Data Error", "Please compute the speed bins first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            f, edges, counts, P, names, ylabel = self.speed_result
+            speed_table(f, edges, counts, P, names).to_csv(save_path, index=False)
+
+    def create_segments_tab(self):
+        controls = ttk.Frame(self.segments_tab)
+        controls.pack(fill='x')
+        entries = []
+        for text, default in (("Window [s]:", "1"), ("Min. duration [s]:", "3"), ("Idle below [km/h]:", "2"), ("Accel. [km/h/s]:", "1")):
+            ttk.Label(controls, text=text).pack(side=tk.LEFT, padx=(5, 2), pady=5)
+            entry = ttk.Entry(controls, width=5)
+            entry.insert(0, default)
+            entry.pack(side=tk.LEFT)
+            entries.append(entry)
+        self.segment_window_entry, self.segment_min_entry, self.segment_idle_entry, self.segment_accel_entry = entries
+        ttk.Button(controls, text="Detect Segments", command=self.detect_run_segments).pack(side=tk.LEFT, padx=5)
+
+        actions = ttk.Frame(self.segments_tab)
+        actions.pack(fill='x')
+        ttk.Button(actions, text="Use as PSD Range", command=self.use_segment_range).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(actions, text="Clear Range", command=self.clear_range).pack(side=tk.LEFT, padx=5)
+        ttk.Button(actions, text="Export Segment PSDs", command=self.export_segment_psds).pack(side=tk.LEFT, padx=5)
+        self.range_label = ttk.Label(actions, text=self.range_text())
+        self.range_label.pack(side=tk.LEFT, padx=10)
+
+        columns = ('state', 'start', 'end', 'duration', 'speed', 'grms')
+        self.segment_table = ttk.Treeview(self.segments_tab, columns=columns, selectmode='browse')
+        self.segment_table.heading('#0', text="Segment")
+        for column, text in zip(columns, ("State", "Start [s]", "End [s]", "Duration [s]", "Mean speed [km/h]", "GRMS")):
+            self.segment_table.heading(column, text=text)
+            self.segment_table.column(column, width=110, anchor='e')
+        self.segment_table.pack(fill='both', expand=True)
+        self.segment_table.bind("<Double-1>", lambda e: self.use_segment_range())
+
+    def detect_run_segments(self):
+        from analysis import detect_segments
+        if self.data is None:
+            messagebox.showerror("Data Error", "Please load the data file first.")
+            return
+        try:
+            self.sensitivity = float(self.sensitivity_entry.get())
+            options = dict(window_s=float(self.segment_window_entry.get()), min_duration=float(self.segment_min_entry.get()),
+                           idle_speed=float(self.segment_idle_entry.get()), accel_threshold=float(self.segment_accel_entry.get()))
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter valid numbers for the sensitivity and segmentation settings.")
+            return
+        velocity = None
+        if self.velocity_data is not None:
+            velocity = (self.velocity_data.iloc[:, 0].to_numpy(), self.velocity_data.iloc[:, 1].to_numpy())
+
+        self.segments = detect_segments(self.data, self.sensitivity, velocity, **options)
+        self.show_segments(with_speed=velocity is not None)
+        self.notebook.select(self.segments_tab)
+
+    def show_segments(self, with_speed):
+        self.segment_table.delete(*self.segment_table.get_children())
+        for k, segment in self.segments.iterrows():
+            self.segment_table.insert('', 'end', iid=str(k), text=segment['name'], values=(
+                segment['state'], f"{segment['start']:.2f}", f"{segment['end']:.2f}", f"{segment['duration']:.1f}",
+                f"{segment['mean_speed']:.1f}" if with_speed else "", f"{segment['grms']:.3f}"))
+
+    def use_segment_range(self):
+        # The picked segment becomes the range of the PSD and all spectral tabs
+        selection = self.segment_table.selection()
+        if self.segments is None or not selection:
+            messagebox.showinfo("Segments", "Pick a segment first.")
+            return
+        segment = self.segments.loc[int(selection[0])]
+        self.selected_range = (float(segment['start']), float(segment['end']))
+        self.range_label.config(text=f"PSD range: {segment['name']} ({segment['start']:.2f} - {segment['end']:.2f} s)")
+        self.plot_psd_from_selection()
+
+    def clear_range(self):
+        self.selected_range = None
+        if self.segments_tab not in self.tab_builders:
+            self.range_label.config(text=self.range_text())
+
+    def range_text(self):
+        if self.selected_range is None:
+            return "PSD range: whole run"
+        return f"PSD range: {self.selected_range[0]:.2f} - {self.selected_range[1]:.2f} s"
+
+    def export_segment_psds(self):
+        from analysis import channel_label, segment_psds
+        from segmentation import segment_psd_table
+        if self.segments is None:
+            messagebox.showerror("Data Error", "Please detect the segments first.")
+            return
+        settings = self.read_spectral_inputs()
+        if settings is None:
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if not save_path:
+            return
+        with TRACE.stage('segment_psds', segments=len(self.segments)):
+            f, results = segment_psds(self.data, self.segments, self.sensitivity, self.sampling_freq, settings)
+        if not results:
+            messagebox.showinfo("Segments", "No segment is longer than one Welch segment.")
+            return
+        channels = results[0][1].shape[1]
+        segment_psd_table(f, results, [channel_label(k) for k in range(channels)]).to_csv(save_path, index=False)
+        messagebox.showinfo("Export Successful", f"PSDs of {len(results)} segments exported.")
+
+    def create_compare_tab(self):
+        from analysis import channel_label
+        from figure_pool import embed_figure
+        controls = ttk.Frame(self.compare_tab)
+        controls.pack(side=tk.LEFT, fill='y')
+        ttk.Button(controls, text="Add Runs", command=self.add_compare_runs).pack(fill='x', padx=5, pady=5)
+        ttk.Button(controls, text="Remove Run", command=self.remove_compare_run).pack(fill='x', padx=5)
+        ttk.Label(controls, text="Runs:").pack(anchor='w', padx=5, pady=(5, 0))
+        self.compare_run_list = tk.Listbox(controls, selectmode=tk.BROWSE, exportselection=False, height=12, width=30)
+        self.compare_run_list.pack(padx=5)
+        ttk.Label(controls, text="Channel:").pack(anchor='w', padx=5, pady=(5, 0))
+        self.compare_channel_var = tk.StringVar(value=channel_label(0))
+        self.compare_channel_box = ttk.Combobox(controls, textvariable=self.compare_channel_var, state='readonly', width=12)
+        self.compare_channel_box.pack(anchor='w', padx=5)
+        self.compare_channel_box.bind("<<ComboboxSelected>>", lambda e: self.draw_compare())
+        ttk.Button(controls, text="Update Overlay", command=self.update_compare_runs).pack(fill='x', padx=5, pady=5)
+        self.compare_status_label = ttk.Label(controls, text="", wraplength=200)
+        self.compare_status_label.pack(anchor='w', padx=5)
+
+        plot_area = ttk.Frame(self.compare_tab)
+        plot_area.pack(side=tk.LEFT, fill='both', expand=True)
+        self.compare_fig, self.compare_axs, self.compare_canvas = embed_figure(plot_area, figsize=(10, 8), nrows=2)
+
+    def compare_inputs(self):
+        # Compared runs are the raw acceleration records at the full sampling
+        # frequency, whatever the current run is shown as. None after an error.
+        settings = self.read_spectral_inputs()
+        if settings is None:
+            return None
+        self.compare_inputs_used = (self.sensitivity, self.sampling_freq * self.decimation, settings)
+        return self.compare_inputs_used
+
+    def submit_compare_run(self, file_path, inputs):
+        # Runs already analysed with these inputs are not sent again. With an
+        # analysis server URL on the Inputs tab the server does the work.
+        key = (inputs[0], inputs[1], astuple(inputs[2]))
+        run = self.compare_runs.setdefault(file_path, {})
+        if run.get('key') == key:
+            return
+        run['key'] = key
+        run['f'] = run['Pxx'] = None
+        self.run_loader.server = self.server_entry.get().strip() or None
+        self.run_loader.submit((file_path, key), file_path, *inputs)
+
+    def add_compare_runs(self):
+        inputs = self.compare_inputs()
+        if inputs is None:
+            return
+        paths = filedialog.askopenfilenames(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx"), ("TDMS files", "*.tdms")])
+        for file_path in paths:
+            if file_path not in self.compare_runs:
+                self.compare_run_list.insert(tk.END, os.path.basename(file_path))
+            self.submit_compare_run(file_path, inputs)
+        self.draw_compare()
+        self.poll_compare_runs()
+
+    def update_compare_runs(self):
+        # Picks up changed spectral settings, unchanged runs are only redrawn
+        inputs = self.compare_inputs()
+        if inputs is None:
+            return
+        for file_path in self.compare_runs:
+            self.submit_compare_run(file_path, inputs)
+        self.draw_compare()
+        self.poll_compare_runs()
+
+    def remove_compare_run(self):
+        selection = self.compare_run_list.curselection()
+        if not selection:
+            return
+        file_path = list(self.compare_runs)[selection[0]]
+        del self.compare_runs[file_path]
+        self.compare_run_list.delete(selection[0])
+        self.draw_compare(only=[file_path])
+
+    def poll_compare_runs(self):
+        # Results come in from the worker processes while the Tk loop runs.
+        # Only the runs that just came in are drawn, so waiting on the others
+        # costs the Tk thread nothing.
+        from record_cache import open_record
+        arrived = []
+        for (file_path, key), result, error in self.run_loader.poll():
+            run = self.compare_runs.get(file_path)
+            if run is None or run['key'] != key:
+                # Removed, or sent again with other settings meanwhile
+                continue
+            arrived.append(file_path)
+            if error is not None:
+                index = list(self.compare_runs).index(file_path)
+                del self.compare_runs[file_path]
+                self.compare_run_list.delete(index)
+                messagebox.showerror("Compare Runs", f"{os.path.basename(file_path)}: {error}")
+                continue
+            if run.get('record_path') != result['record_path'] or result['data'] is not None:
+                run['record_path'] = result['record_path']
+                run['data'] = result['data'] if result['data'] is not None else open_record(result['record_path'])
+                run['pyramid'] = Pyramid.open(result['record_path']) if result['record_path'] is not None else None
+            run['f'], run['Pxx'] = result['f'], result['Pxx']
+        waiting = sum(run.get('f') is None for run in self.compare_runs.values())
+        self.compare_status_label.config(text=f"Loading {waiting} run(s)..." if waiting else "")
+        if arrived:
+            self.draw_compare(only=arrived)
+        if self.run_loader.pending:
+            self.after(200, self.poll_compare_runs)
+
+    def current_compare_run(self):
+        # (data, pyramid, f, Pxx) of the current run with the compare inputs,
+        # worked out once per record and inputs rather than on every redraw
+        from analysis import cached_psd
+        if self.raw_record is None or self.compare_inputs_used is None:
+            return None
+        data, record_path = self.raw_record
+        sensitivity, sampling_freq, settings = self.compare_inputs_used
+        # compare_current holds on to data, so its id is not reused meanwhile
+        key = (id(data), sensitivity, sampling_freq, astuple(settings))
+        if self.compare_current is None or self.compare_current[0] != key:
+            f, Pxx = cached_psd(data, record_path, *self.compare_inputs_used)
+            pyramid = Pyramid.open(record_path) if record_path is not None else None
+            self.compare_current = (key, data, pyramid, f, Pxx)
+        return self.compare_current[1:]
+
+    def draw_compare(self, only=None):
+        # Top: G-level envelope of the channel for every run, bottom: its PSDs.
+        # The current run is drawn first from its unfiltered record. only
+        # lists the compared runs to draw again or take out, the rest is left
+        # as it is; None draws everything from scratch.
+        from analysis import channel_label
+        runs = {}
+        current = self.current_compare_run()
+        if current is not None:
+            runs[None] = (f"current: {os.path.basename(self.file_path)}", *current)
+        for file_path, run in self.compare_runs.items():
+            if run.get('f') is not None:
+                runs[file_path] = (os.path.basename(file_path), run['data'], run['pyramid'], run['f'], run['Pxx'])
+
+        channels = max((data.shape[1] - 1 for _, data, _, _, _ in runs.values()), default=0)
+        names = [channel_label(k) for k in range(channels)]
+        self.compare_channel_box.config(values=names)
+        channel = names.index(self.compare_channel_var.get()) if self.compare_channel_var.get() in names else 0
+
+        ax_glevel, ax_psd = self.compare_axs
+        sensitivity, _, settings = self.compare_inputs_used or (None, None, None)
+        if only is None:
+            for envelope, _ in self.compare_lines.values():
+                envelope.disconnect()
+            self.compare_lines = {}
+            ax_glevel.clear()
+            ax_psd.clear()
+            title = names[channel] if names else ""
+            ax_glevel.set_title(f"{title} G-Levels")
+            ax_glevel.set_xlabel("Time")
+            ax_glevel.set_ylabel("G-Levels")
+            ax_psd.set_title(f"{title} PSD")
+            ax_psd.set_xlabel("Frequency [Hz]")
+            ax_psd.set_ylabel(settings.ylabel() if settings else "PSD [G^2/Hz]")
+            for ax in self.compare_axs:
+                ax.grid(True)
+            only = list(runs)
+
+        scale = 1000 / sensitivity if sensitivity else 1.0
+        for key in only:
+            if key in self.compare_lines:
+                envelope, line = self.compare_lines.pop(key)
+                envelope.disconnect()
+                envelope.line.remove()
+                line.remove()
+            if key not in runs:
+                continue
+            name, data, pyramid, f, Pxx = runs[key]
+            if channel >= Pxx.shape[1]:
+                continue
+            envelope = EnvelopeLine(ax_glevel, data.iloc[:, 0].to_numpy(), data.iloc[:, channel + 1].to_numpy(),
+                                    scale=scale, pyramid=pyramid, channel=channel, label=name)
+            line, = ax_psd.semilogy(f, Pxx[:, channel], label=name)
+            self.compare_lines[key] = (envelope, line)
+        for ax in self.compare_axs:
+            ax.relim()
+            ax.autoscale_view()
+            if ax.lines:
+                ax.legend(loc='upper right', fontsize=8)
+            elif ax.get_legend() is not None:
+                ax.get_legend().remove()
+        self.compare_canvas.draw_idle()
+
+    # Entries and variables whose values are kept in a saved session
+    SESSION_FIELDS = (
+        'sensitivity_entry', 'nperseg_entry', 'sampling_freq_entry', 'memory_budget_entry', 'server_entry', 'velocity_present',
+        'window_var', 'overlap_var', 'nfft_var', 'detrend_var', 'average_var', 'scaling_var', 'onesided_var',
+        'filter_kind_var', 'filter_response_var', 'filter_cutoff_var', 'filter_order_var', 'filter_ripple_var',
+        'filter_zero_phase_var', 'decimation_var', 'quantity_var', 'integration_highpass_var',
+        'fraction_var', 'octave_channel_var', 'coherence_fmin_entry', 'coherence_fmax_entry', 'frf_reference_var',
+        'fdd_count_entry', 'fdd_fmin_entry', 'fdd_fmax_entry', 'fdd_mode_var',
+        'envelope_low_entry', 'envelope_high_entry', 'envelope_fmax_entry', 'speed_width_entry', 'speed_channel_var',
+        'segment_window_entry', 'segment_min_entry', 'segment_idle_entry', 'segment_accel_entry', 'compare_channel_var',
+    )
+
+    def save_session(self):
+        # Settings, a reference to the cached record and every computed result.
+        # The data stays in the record cache, it is not copied into the session.
+        save_path = filedialog.asksaveasfilename(defaultextension=".npz", filetypes=[("Analysis sessions", "*.npz")])
+        if not save_path:
+            return
+        arrays = {}
+        state = {
+            # Tabs never opened still have their defaults, nothing to keep
+            'fields': {name: getattr(self, name).get() for name in self.SESSION_FIELDS if hasattr(self, name)},
+            'pair': [var.get() for var in getattr(self, 'pair_vars', ())],
+            'selections': {'frf': self.list_selection('frf_response_list'), 'envelope': self.list_selection('envelope_channel_list')},
+            'file': self.file_path,
+            'record_path': self.raw_record[1] if self.raw_record else None,
+            'decimation': self.decimation,
+            'filter': asdict(self.active_filter) if self.active_filter else None,
+            'integration': list(self.integration),
+            'selected_range': list(self.selected_range) if self.selected_range else None,
+            'glevels': self.pack_glevels(arrays),
+            'channel_page': self.channel_page,
+            'channel_summary': self.channel_summary.to_dict('list') if self.channel_summary is not None else None,
+            'psd_settings': asdict(self.psd_settings) if self.psd_settings else None,
+            'csd_key': list(self.csd_key[1:]) if self.csd_result is not None else None,
+            'frf_reference': self.frf_reference_var.get() if self.frf_result is not None else None,
+            'segments': self.segments.to_dict('list') if self.segments is not None else None,
+            'results': {name: pack_result(arrays, name, result) for name, result in (
+                ('psd', self.psd_result), ('octave', self.octave_result), ('csd', self.csd_result), ('frf', self.frf_result),
+                ('fdd', self.fdd_result), ('envelope', self.envelope_result), ('speed', self.speed_result))},
+            'compare': None,
+        }
+        if self.velocity_data is not None:
+            arrays['velocity'] = self.velocity_data.iloc[:, :2].to_numpy(dtype=float)
+            state['velocity_columns'] = list(map(str, self.velocity_data.columns[:2]))
+        if self.compare_inputs_used is not None:
+            sensitivity, sampling_freq, settings = self.compare_inputs_used
+            runs = [{'file': path, 'record_path': run['record_path'], 'psd': pack_result(arrays, f'compare{k}', (run['f'], run['Pxx']))}
+                    for k, (path, run) in enumerate(self.compare_runs.items()) if run.get('f') is not None and run['record_path']]
+            state['compare'] = {'sensitivity': sensitivity, 'sampling_freq': sampling_freq, 'settings': asdict(settings), 'runs': runs}
+        with TRACE.stage('save_session'):
+            save_session(save_path, state, arrays)
+        messagebox.showinfo("Session Saved", "Session saved successfully.")
+
+    def pack_glevels(self, arrays):
+        # The full-view envelope of every G-level channel on screen, so the
+        # page can still be drawn if the data and its pyramid are gone
+        if self.glevel_view is None or not (self.glevel_pool and self.glevel_pool.slots):
+            return None
+        scale, velocity, ylabel = self.glevel_view
+        channels = {}
+        for slot in self.glevel_pool.slots:
+            for j, ax in enumerate(slot.axs):
+                envelope = slot.artists.get(('glevel', j))
+                if ax.get_visible() and envelope is not None:
+                    channels[envelope.channel] = pack_result(arrays, f'glevel{envelope.channel}', envelope.envelope(None))
+        return {'scale': scale, 'velocity': velocity is not None, 'ylabel': ylabel, 'channels': channels}
+
+    def list_selection(self, name):
+        listbox = getattr(self, name, None)
+        return list(listbox.curselection()) if listbox is not None else []
+
+    def open_session(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Analysis sessions", "*.npz")])
+        if not file_path:
+            return
+        try:
+            with TRACE.stage('open_session', file=os.path.basename(file_path)):
+                self.restore_session(*load_session(file_path))
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Session", f"Could not open the session: {e}")
+
+    def restore_session(self, state, arrays):
+        # Every tab is redrawn from the stored results, nothing is recomputed.
+        # The record is reopened from the cache; derived records are cached too.
+        from analysis import load_data
+        from record_cache import open_record
+        import pandas as pd
+        self.build_all_tabs()
+        for name, value in state['fields'].items():
+            widget = getattr(self, name)
+            if isinstance(widget, tk.Variable):
+                widget.set(value)
+            else:
+                widget.delete(0, tk.END)
+                widget.insert(0, value)
+        for var, value in zip(self.pair_vars, state['pair']):
+            var.set(value)
+        self.toggle_velocity_profile()
+
+        self.raw_record = None
+        record = open_record(state['record_path']) if state['record_path'] else None
+        if record is not None:
+            self.raw_record = (record, state['record_path'])
+        elif state['file'] and os.path.exists(state['file']):
+            # The cached record was cleaned up, the source file is parsed again
+            self.raw_record = load_data(state['file'])
+        if self.raw_record is not None:
+            self.file_path = state['file']
+            spec = FilterSpec(**dict(state['filter'], cutoff=tuple(state['filter']['cutoff']))) if state['filter'] else None
+            self.prepare_data(state['decimation'], spec, tuple(state['integration']))
+            for listbox, selection in ((self.frf_response_list, state['selections']['frf']), (self.envelope_channel_list, state['selections']['envelope'])):
+                listbox.selection_clear(0, tk.END)
+                for k in selection:
+                    listbox.selection_set(k)
+        else:
+            self.data = self.record_path = self.pyramid = None
+            self.decimation = state['decimation']
+            messagebox.showwarning("Session", "The data of this session is no longer available, only the results are shown.")
+
+        self.velocity_data = None
+        if 'velocity' in arrays:
+            self.velocity_data = pd.DataFrame(arrays['velocity'], columns=state['velocity_columns'])
+        if state['selected_range']:
+            self.selected_range = tuple(state['selected_range'])
+            self.range_label.config(text=self.range_text())
+        else:
+            self.clear_range()
+        try:
+            self.sensitivity = float(self.sensitivity_entry.get())
+            self.sampling_freq = float(self.sampling_freq_entry.get()) / self.decimation
+        except ValueError:
+            pass
+
+        results = {name: unpack_result(arrays, items) for name, items in state['results'].items()}
+        self.channel_page = state.get('channel_page', 0)
+        self.update_page_labels()
+        self.psd_settings = SpectralSettings(**state['psd_settings']) if state['psd_settings'] else None
+        self.psd_result = results['psd']
+        if self.psd_result is not None:
+            self.draw_psds()
+        glevels = state.get('glevels')
+        if glevels is not None:
+            velocity = None
+            if glevels['velocity'] and self.velocity_data is not None:
+                velocity = (self.velocity_data.iloc[:, 0].to_numpy(), self.velocity_data.iloc[:, 1].to_numpy())
+            self.glevel_view = (glevels['scale'], velocity, glevels['ylabel'])
+            if self.data is not None:
+                # The record is back, zooming gets the full detail of the pyramid
+                self.draw_glevels()
+            else:
+                self.draw_glevels({int(channel): unpack_result(arrays, items) for channel, items in glevels['channels'].items()})
+
+        self.octave_result = results['octave']
+        if self.octave_result is not None:
+            self.octave_channel_box.config(values=self.octave_result[5])
+            self.draw_octave_bands()
+
+        self.csd_result = results['csd']
+        if self.csd_result is not None:
+            selected_range, channels, sensitivity, sampling_freq, settings = state['csd_key']
+            self.csd_key = (id(self.data), tuple(selected_range) if selected_range else None, channels, sensitivity, sampling_freq, tuple(settings))
+            for box in self.pair_boxes:
+                box.config(values=self.csd_result[3])
+            self.draw_coherence()
+
+        self.frf_result = results['frf']
+        if self.frf_result is not None:
+            self.draw_frf(state['frf_reference'])
+
+        self.fdd_result = results['fdd']
+        if self.fdd_result is not None:
+            f, singular, peaks, shapes = self.fdd_result
+            self.fdd_mode_box.config(values=[f'Mode {m + 1} - {f[p]:.1f} Hz' for m, p in enumerate(peaks)])
+            self.draw_fdd()
+
+        self.envelope_result = results['envelope']
+        if self.envelope_result is not None:
+            self.draw_envelope(float(self.envelope_fmax_entry.get() or np.inf))
+
+        self.speed_result = results['speed']
+        if self.speed_result is not None:
+            self.speed_channel_box.config(values=self.speed_result[4])
+            self.draw_speed_bins()
+
+        self.channel_summary = pd.DataFrame(state['channel_summary']) if state.get('channel_summary') is not None else None
+        self.show_channel_summary()
+
+        self.segments = pd.DataFrame(state['segments']) if state['segments'] is not None else None
+        if self.segments is not None:
+            self.show_segments(with_speed=self.velocity_data is not None)
+
+        self.compare_runs.clear()
+        self.compare_run_list.delete(0, tk.END)
+        self.compare_inputs_used = None
+        compare = state['compare']
+        if compare is not None:
+            settings = SpectralSettings(**compare['settings'])
+            self.compare_inputs_used = (compare['sensitivity'], compare['sampling_freq'], settings)
+            key = (compare['sensitivity'], compare['sampling_freq'], astuple(settings))
+            for run in compare['runs']:
+                data = open_record(run['record_path'])
+                if data is None:
+                    continue
+                f, Pxx = unpack_result(arrays, run['psd'])
+                self.compare_runs[run['file']] = {'key': key, 'record_path': run['record_path'], 'data': data,
+                                                  'pyramid': Pyramid.open(run['record_path']), 'f': f, 'Pxx': Pxx}
+                self.compare_run_list.insert(tk.END, os.path.basename(run['file']))
+            self.draw_compare()
+
+    def load_file(self):
+        from analysis import load_data
+        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx"), ("TDMS files", "*.tdms")])
+        if file_path and self.confirm_memory(project_load_bytes(file_path), "Loading this file"):
+            with TRACE.stage('load_file', file=os.path.basename(file_path)) as info:
+                self.raw_record = load_data(file_path)
+                self.file_path = file_path
+                self.decimation_var.set("1")
+                self.quantity_var.set('acceleration')
+                self.prepare_data(1, None, ('acceleration', None))
+                self.clear_range()
+                info['samples'] = self.data.size
+            messagebox.showinfo("File Loaded", "Vibration profile loaded successfully.")
 
     def load_velocity_profile(self):
+        from analysis import read_table
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Excel files", "*.xlsx")])
         if file_path:
-            if file_path.endswith('.csv'):
-                self.velocity_data = self.load_csv_parallel(file_path)
-            elif file_path.endswith('.xlsx'):
-                self.velocity_data = self.load_excel_parallel(file_path)
+            self.velocity_data = read_table(file_path)
             messagebox.showinfo("File Loaded", "Velocity profile loaded successfully.")
 
     def plot_glevels(self):
         if self.data is not None:
             try:
                 self.sensitivity = float(self.sensitivity_entry.get())
-                self.sampling_freq = float(self.sampling_freq_entry.get())
+                self.sampling_freq = float(self.sampling_freq_entry.get()) / self.decimation
             except ValueError:
                 messagebox.showerror("Input Error", "Please enter valid numbers for sensitivity and sampling frequency.")
                 return
 
-            time = self.data.iloc[:, 0]
-            channel_data = self.data.iloc[:, 1:] * 1000/ self.sensitivity
+            if self.velocity_data is not None and self.velocity_present.get():
+                velocity = (self.velocity_data.iloc[:, 0].to_numpy(), self.velocity_data.iloc[:, 1].to_numpy())
+            else:
+                velocity = None
 
-            self.clear_plots(self.glevel_plots, self.glevel_figs, self.glevel_axs)
+            self.glevel_view = (1000 / self.sensitivity, velocity, "G-Levels" if self.unit == 'G' else f"Vibration [{self.unit}]")
+            if self.draw_glevels():
+                self.notebook.select(self.glevel_tab)
+        else:
+            messagebox.showerror("Data Error", "Please load the data file first.")
 
-            for i in range(0, min(channel_data.shape[1], 24), 3):
-                fig, axs = plt.subplots(3, 1, figsize=(10, 10))
-                self.glevel_figs.append(fig)
+    def draw_glevels(self, envelopes=None):
+        # The G-levels of the channels on the current page, False if the
+        # memory check stopped it. envelopes holds the envelopes of a saved
+        # session's page by channel, drawn when its data is no longer there.
+        from plots import plot_glevel_axes
+        scale, velocity, ylabel = self.glevel_view
+        if envelopes is None:
+            time = self.data.iloc[:, 0].to_numpy()
+            channel_data = self.data.iloc[:, 1:]
+            first, stop = page_range(self.channel_page, channel_data.shape[1])
+            if not self.confirm_memory(project_glevel_bytes(len(time), stop - first, -(-(stop - first) // 3)), "Plotting the G-levels"):
+                return False
+            samples = len(time) * (stop - first)
+        else:
+            time = channel_data = None
+            first, stop = min(envelopes), max(envelopes) + 1
+            samples = sum(len(y) for _, y in envelopes.values())
+        with TRACE.stage('plot_glevels', samples=samples, page=self.channel_page + 1):
+            self.build_tab(self.glevel_tab)
+            self.glevel_pool.begin()
 
-                for j, ax in enumerate(axs):
-                    ax.clear()
-                    ax.plot(time, channel_data.iloc[:, i+j], label=f'Channel {i//3 + 1} - {"XYZ"[j]}')
-                    ax.set_xlabel("Time")
-                    ax.set_ylabel("G-Levels")
-                    ax.legend(loc='upper right')
+            for i in range(first, stop, 3):
+                slot = self.glevel_pool.acquire()
+                plot_glevel_axes(slot.axs, slot.artists, time, channel_data, i, scale, self.pyramid, velocity, ylabel, envelopes)
 
-                    if self.velocity_data is not None and self.velocity_present.get():
-                        velocity_time = self.velocity_data.iloc[:, 0]
-                        velocity = self.velocity_data.iloc[:, 1]
-                        ax_velocity = ax.twinx()
-                        ax_velocity.plot(velocity_time, velocity, label='Velocity', linestyle='--', color='red')
-                        ax_velocity.set_ylabel("Velocity")
-                        ax_velocity.legend(loc='upper left')
+            self.glevel_pool.finish()
+        return True
 
-                    self.highlight_extreme_peaks(ax)
+    def show_channel_page(self, page):
+        # Turning the page redraws the pooled figures in place, nothing is
+        # kept of the other pages
+        self.channel_page = min(max(page, 0), page_count(len(self.channel_names)) - 1)
+        self.update_page_labels()
+        with TRACE.stage('show_channel_page', page=self.channel_page + 1):
+            if self.glevel_view is not None and self.data is not None:
+                self.draw_glevels()
+            if self.psd_result is not None:
+                self.draw_psds()
 
-                self.glevel_canvas.update_idletasks()
-                plot = FigureCanvasTkAgg(fig, master=self.glevel_canvas)
-                plot.get_tk_widget().pack(fill='both', expand=True)
-                plot.toolbar = NavigationToolbar2Tk(plot, self.glevel_canvas)
-                plot.toolbar.update()
-                plot.get_tk_widget().pack(fill='both', expand=True)
-                self.glevel_plots.append(plot)
-
-            self.notebook.select(self.glevel_tab)
-        else:
-            messagebox.showerror("Data Error", "Please load the data file first.")
+    def read_spectral_inputs(self):
+        # Sensitivity, sampling frequency and the spectral settings from the
+        # Inputs tab, None once the error has been shown
+        try:
+            self.sensitivity = float(self.sensitivity_entry.get())
+            self.sampling_freq = float(self.sampling_freq_entry.get()) / self.decimation
+            self.nperseg = int(self.nperseg_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter valid numbers for sensitivity and sampling frequency.")
+            return None
+        try:
+            return self.spectral_settings()
+        except ValueError as e:
+            messagebox.showerror("Spectral Settings", str(e))
+            return None
 
     def plot_psd_from_selection(self):
+        # The spectra of every channel are computed, a page of channels at a
+        # time, and kept; only the current page is drawn
+        from analysis import channel_count, select_range, compute_psd
         if self.data is not None:
-            try:
-                self.sensitivity = float(self.sensitivity_entry.get())
-                self.sampling_freq = float(self.sampling_freq_entry.get())
-                self.nperseg = int(self.nperseg_entry.get())
-            except ValueError:
-                messagebox.showerror("Input Error", "Please enter valid numbers for sensitivity and sampling frequency.")
+            settings = self.read_spectral_inputs()
+            if settings is None:
                 return
 
-            self.clear_plots(self.psd_plots, self.psd_figs, self.psd_axs)
+            data_subset = select_range(self.data, self.selected_range)
+            channels = channel_count(self.data)
+            if not self.confirm_memory(project_psd_bytes(len(data_subset), channels, settings), "Computing the PSDs"):
+                return
+            with TRACE.stage('plot_psd_from_selection', samples=len(data_subset) * channels):
+                f, Pxx = compute_psd(data_subset.iloc[:, 1:].to_numpy(), self.sensitivity, self.sampling_freq, settings)
+                self.psd_result = (f, Pxx)
+                self.psd_settings = settings
+                self.draw_psds()
+            self.show_channel_summary()
+            self.notebook.select(self.psd_tab)
+        else:
+            messagebox.showerror("Data Error", "Please load the data file first.")
 
-            for i in range(0, min(self.data.shape[1]-1, 24), 3):
-                fig, axs = plt.subplots(3, 1, figsize=(10, 8))
-                self.psd_figs.append(fig)
+    def draw_psds(self):
+        from plots import plot_psd_axes
+        f, Pxx = self.psd_result
+        self.build_tab(self.psd_tab)
+        self.psd_pool.begin()
 
-                for j, ax in enumerate(axs):
-                    if self.selected_range is not None:
-                        start, end = self.selected_range
-                        data_subset = self.data[(self.data.iloc[:, 0] >= start) & (self.data.iloc[:, 0] <= end)]
-                    else:
-                        data_subset = self.data
+        first, stop = page_range(self.channel_page, Pxx.shape[1])
+        for i in range(first, stop, 3):
+            slot = self.psd_pool.acquire()
+            plot_psd_axes(slot.axs, slot.artists, f, Pxx, i, self.psd_settings.ylabel(self.unit))
 
-                    time = data_subset.iloc[:, 0]
-                    channel_data = data_subset.iloc[:, i + 1 + j] *1000/ self.sensitivity
+        self.psd_pool.finish()
 
-                    f, Pxx = welch(channel_data, fs=self.sampling_freq,nperseg=self.nperseg,noverlap=0,nfft=2048)
+    def channel_summary_table(self):
+        # One row per channel: its page, the G-level summary if it has been
+        # worked out and the peak of the last PSD if there is one
+        import pandas as pd
+        from analysis import channel_label
+        table = pd.DataFrame({'channel': self.channel_names, 'page': [k // PAGE_CHANNELS + 1 for k in range(len(self.channel_names))]})
+        if self.channel_summary is not None:
+            table = table.merge(self.channel_summary, on='channel', how='left')
+        if self.psd_result is not None:
+            f, Pxx = self.psd_result
+            peak = Pxx.argmax(axis=0)
+            table = table.merge(pd.DataFrame({'channel': [channel_label(k) for k in range(Pxx.shape[1])], 'psd_peak_hz': f[peak],
+                                              'psd_peak': Pxx[peak, np.arange(Pxx.shape[1])]}), on='channel', how='left')
+        if self.channel_sort is not None and self.channel_sort[0] in table:
+            column, descending = self.channel_sort
+            # Channel names sort in channel order, not as text
+            key = (lambda c: c.map(self.channel_names.index)) if column == 'channel' else None
+            table = table.sort_values(column, ascending=not descending, key=key, na_position='last')
+        return table
 
-                    ax.clear()
-                    ax.semilogy(f, Pxx, label=f'Channel {i//3 + 1} - {"XYZ"[j]}')
-                    ax.set_xlabel("Frequency [Hz]")
-                    ax.set_ylabel("PSD [G^2/Hz]")
-                    ax.legend(loc='upper right')
+    def show_channel_summary(self):
+        if self.channels_tab in self.tab_builders:
+            return
+        self.channel_table.delete(*self.channel_table.get_children())
+        for row in self.channel_summary_table().itertuples(index=False):
+            row = row._asdict()
+            # Columns not worked out yet, or NaN for this channel, stay empty
+            values = [f"{row[column]:.4g}" if column in row and row[column] == row[column] else "" for column in self.CHANNEL_COLUMNS[1:]]
+            self.channel_table.insert('', 'end', iid=row['channel'], text=row['channel'], values=[row['page'], *values])
 
-                    self.highlight_extreme_peaks(ax)
+    def sort_channel_table(self, column):
+        # A second click on the same heading reverses the order
+        descending = column != 'channel'
+        if self.channel_sort is not None and self.channel_sort[0] == column:
+            descending = not self.channel_sort[1]
+        self.channel_sort = (column, descending)
+        self.show_channel_summary()
 
-                self.psd_canvas.update_idletasks()
-                plot = FigureCanvasTkAgg(fig, master=self.psd_canvas)
-                plot.get_tk_widget().pack(fill='both', expand=True)
-                plot.toolbar = NavigationToolbar2Tk(plot, self.psd_canvas)
-                plot.toolbar.update()
-                plot.get_tk_widget().pack(fill='both', expand=True)
-                self.psd_plots.append(plot)
+    def compute_channel_summary(self):
+        from analysis import glevel_stats
+        if self.data is None:
+            messagebox.showerror("Data Error", "Please load the data file first.")
+            return
+        try:
+            self.sensitivity = float(self.sensitivity_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a valid number for the sensitivity.")
+            return
+        with TRACE.stage('channel_summary', samples=self.data.size):
+            self.channel_summary = glevel_stats(self.data, self.sensitivity)
+        self.show_channel_summary()
 
-            self.notebook.select(self.psd_tab)
-        else:
+    def export_channel_summary(self):
+        if not self.channel_names:
             messagebox.showerror("Data Error", "Please load the data file first.")
+            return
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if save_path:
+            self.channel_summary_table().to_csv(save_path, index=False)
+            messagebox.showinfo("Export Successful", "Channel table exported successfully.")
+
+    def open_channel_page(self):
+        selection = self.channel_table.selection()
+        if not selection:
+            return
+        self.show_channel_page(self.channel_names.index(selection[0]) // PAGE_CHANNELS)
+        if self.glevel_view is not None:
+            self.notebook.select(self.glevel_tab)
+        elif self.psd_result is not None:
+            self.notebook.select(self.psd_tab)
 
-    def highlight_extreme_peaks(self, ax):
-        for line in ax.get_lines():
-            xdata = line.get_xdata()
-            ydata = line.get_ydata()
-            if len(ydata) > 0:
-                max_idx = np.argmax(ydata)
-                min_idx = np.argmin(ydata)
-                ax.plot(xdata[max_idx], ydata[max_idx], marker='o', markersize=2, color='red')
-                ax.text(xdata[max_idx], ydata[max_idx], f'{ydata[max_idx]:}', fontsize=8, color='red', ha='left', va='bottom', bbox=dict(facecolor='white', alpha=0.5))
-                ax.plot(xdata[min_idx], ydata[min_idx], marker='o', markersize=2, color='blue')
-                ax.text(xdata[min_idx], ydata[min_idx], f'{ydata[min_idx]:}', fontsize=8, color='blue', ha='left', va='top', bbox=dict(facecolor='white', alpha=0.5))
-
-    def clear_plots(self, plots, figs, axs):
-        for plot in plots:
-            plot.get_tk_widget().pack_forget()
-        plots.clear()
-        figs.clear()
-        axs.clear()
+    def page_figures(self, pool, channels, figsize, draw):
+        # The figures of every page in order for the report: the current
+        # page's are the ones on screen, zoom included, the other pages are
+        # drawn on fresh figures with draw(axs, first channel)
+        from plots import new_figure
+        for page in range(page_count(channels)):
+            if page == self.channel_page:
+                yield from pool.figures()
+                continue
+            first, stop = page_range(page, channels)
+            for i in range(first, stop, 3):
+                fig, axs = new_figure(figsize=figsize)
+                draw(axs, i)
+                yield fig
 
     def export_plots(self):
-        
-        doc = Document()
-        doc.add_heading('G-Levels and PSD Plots', 0)
-
-        for fig in self.glevel_figs:
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-                fig.savefig(tmpfile.name)
-                doc.add_paragraph('G-Level Plot')
-                doc.add_picture(tmpfile.name, width=Inches(6))
-                os.unlink(tmpfile.name)
-
-        for fig in self.psd_figs:
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-                fig.savefig(tmpfile.name)
-                doc.add_paragraph('PSD Plot')
-                doc.add_picture(tmpfile.name, width=Inches(6))
-                os.unlink(tmpfile.name)
-
+        from plots import plot_glevel_axes, plot_psd_axes
+        from report_export import write_report
         save_path = filedialog.asksaveasfilename(defaultextension=".docx", filetypes=[("Word documents", "*.docx")])
-        if save_path:
-            doc.save(save_path)
-            messagebox.showinfo("Export Successful", "Plots exported successfully.")
+        if not save_path:
+            return
+
+        def plots():
+            # Other pages are drawn one figure at a time as the report renders them
+            if self.glevel_view is not None and self.data is not None and self.glevel_pool and self.glevel_pool.slots:
+                scale, velocity, ylabel = self.glevel_view
+                time = self.data.iloc[:, 0].to_numpy()
+                channel_data = self.data.iloc[:, 1:]
+                for fig in self.page_figures(self.glevel_pool, channel_data.shape[1], (10, 10), lambda axs, i:
+                                             plot_glevel_axes(axs, {}, time, channel_data, i, scale, self.pyramid, velocity, ylabel)):
+                    yield 'G-Level Plot', fig
+            if self.psd_result is not None and self.psd_pool and self.psd_pool.slots:
+                f, Pxx = self.psd_result
+                for fig in self.page_figures(self.psd_pool, Pxx.shape[1], (10, 8), lambda axs, i:
+                                             plot_psd_axes(axs, {}, f, Pxx, i, self.psd_settings.ylabel(self.unit))):
+                    yield 'PSD Plot', fig
+
+        with TRACE.stage('export_plots') as info:
+            info['figures'] = write_report(save_path, plots())
+        messagebox.showinfo("Export Successful", "Plots exported successfully.")
 
 if __name__ == "__main__":
     app = GLevelPSDApp()
+    app.report_startup(START, exit_after='--startup-time' in sys.argv)
     app.mainloop()
- 
-a
-zx
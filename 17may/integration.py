@@ -0,0 +1,51 @@
+import numpy as np
+
+# Acceleration to velocity and displacement by dividing the spectrum by
+# (j 2 pi f)^order. Below the high-pass cutoff the gain is tapered to zero,
+# otherwise the drift and the noise at the lowest frequencies would swamp the
+# result. Long records are integrated in overlapping blocks: each block is
+# transformed with a margin on both sides that is tapered and thrown away,
+# which keeps the circular wrap-around of the FFT out of the kept samples.
+
+STANDARD_GRAVITY = 9.80665
+# (unit, order); values stay in the record's raw units times these factors,
+# so the usual G calibration factor turns them into mm/s and mm
+QUANTITIES = {'acceleration': ('G', 0), 'velocity': ('mm/s', 1), 'displacement': ('mm', 2)}
+BLOCK = 2**18
+
+
+def integration_gain(f, order, highpass):
+    # (j 2 pi f)^-order with a half-cosine fade-in from highpass / 2 to highpass
+    taper = np.clip((f - highpass / 2) / (highpass / 2), 0, 1)
+    taper = 0.5 - 0.5 * np.cos(np.pi * taper)
+    gain = np.zeros(len(f), dtype=complex)
+    nonzero = taper > 0
+    gain[nonzero] = taper[nonzero] / (2j * np.pi * f[nonzero]) ** order
+    return gain
+
+
+def integrate_channels(x, out, sampling_freq, order, highpass, block=BLOCK):
+    # Integrates the rows of x (n_channels, n_samples) order times into out,
+    # which may be memory-mapped, with the result in mm/s or mm per G
+    from scipy.fft import rfft, irfft, rfftfreq, next_fast_len
+    n = x.shape[1]
+    # A few periods of the cutoff either side lets the kept samples settle
+    margin = min(int(4 * sampling_freq / highpass), n)
+    factor = STANDARD_GRAVITY * 1000
+    length = next_fast_len(block + 2 * margin, real=True)
+    gain = integration_gain(rfftfreq(length, 1 / sampling_freq), order, highpass) * factor
+    ramp = 0.5 - 0.5 * np.cos(np.pi * np.arange(margin) / max(margin, 1))
+
+    for start in range(0, n, block):
+        lo, hi = max(start - margin, 0), min(start + block + margin, n)
+        segment = np.asarray(x[:, lo:hi], dtype=np.float64)
+        segment = segment - segment.mean(axis=1, keepdims=True)
+        # Only the margins are tapered, the kept samples are untouched
+        if lo > 0:
+            segment[:, :margin] *= ramp
+        if hi < n:
+            segment[:, -margin:] *= ramp[::-1]
+        integrated = irfft(rfft(segment, n=length, axis=-1) * gain, n=length, axis=-1)
+        count = min(block, n - start)
+        out[:, start:start + count] = integrated[:, start - lo:start - lo + count]
+    return out
@@ -0,0 +1,167 @@
+import mmap
+import os
+import sys
+import threading
+
+import numpy as np
+
+from channel_pages import PAGE_CHANNELS
+from psd_engine import CHUNK_SPECTRA
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Where the memory of the app goes: process RSS next to the bytes held by
+# loaded records, derived arrays, caches and matplotlib figures, and a
+# budget check to run before operations that would allocate a lot.
+
+
+def rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        # ru_maxrss is the lifetime peak, kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def physical_memory_bytes():
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, AttributeError, OSError):
+        return 8 * 2**30
+
+
+def _is_mapped(arr):
+    # Memory-mapped arrays are backed by the cache file, not anonymous memory
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, 'base', None)
+    return False
+
+
+def object_bytes(obj):
+    # (bytes in memory, bytes mapped from files) for the objects the app keeps
+    if obj is None:
+        return 0, 0
+    if isinstance(obj, np.ndarray):
+        return (0, obj.nbytes) if _is_mapped(obj) else (obj.nbytes, 0)
+    # A DataFrame can only exist once pandas is loaded, it is not imported here
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(obj, pd.DataFrame):
+        in_memory, mapped = obj.index.memory_usage(), 0
+        for k in range(obj.shape[1]):
+            a, m = object_bytes(obj.iloc[:, k].to_numpy())
+            in_memory += a
+            mapped += m
+        return in_memory, mapped
+    if isinstance(obj, (list, tuple)):
+        sizes = [object_bytes(o) for o in obj]
+        return sum(s[0] for s in sizes), sum(s[1] for s in sizes)
+    if hasattr(obj, 'axes') and hasattr(obj, 'canvas'):
+        # Figure: line data plus the Agg buffer if it has been drawn. Only an
+        # Agg canvas (the GUI's FigureCanvasTkAgg) keeps a renderer; a bare
+        # Figure has none and so holds no raster, and counts its lines only.
+        in_memory = 0
+        for ax in obj.axes:
+            for line in ax.get_lines():
+                in_memory += np.asarray(line.get_xdata()).nbytes + np.asarray(line.get_ydata()).nbytes
+        if getattr(obj.canvas, 'renderer', None) is not None:
+            width, height = obj.canvas.get_width_height()
+            in_memory += width * height * 4
+        return in_memory, 0
+    return sys.getsizeof(obj), 0
+
+
+class MemoryLedger:
+    # Sources are callables returning (name, object) pairs, evaluated only
+    # when a report is asked for, so nothing is kept alive by the ledger.
+    def __init__(self, budget_bytes=None):
+        self.sources = {}
+        self.lock = threading.Lock()
+        self.budget_bytes = budget_bytes or int(physical_memory_bytes() * 0.75)
+
+    def add_source(self, category, source):
+        with self.lock:
+            self.sources.setdefault(category, []).append(source)
+
+    def report(self):
+        # List of (category, name, in-memory bytes, mapped bytes)
+        rows = []
+        with self.lock:
+            sources = [(c, s) for c, ss in self.sources.items() for s in ss]
+        for category, source in sources:
+            for name, obj in source():
+                in_memory, mapped = object_bytes(obj)
+                if in_memory or mapped:
+                    rows.append((category, name, in_memory, mapped))
+        return rows
+
+    def check(self, projected_bytes, operation):
+        # Returns a warning message if operation would take the process over budget
+        current = rss_bytes()
+        if current + projected_bytes <= self.budget_bytes:
+            return None
+        return (f"{operation} is expected to need about {projected_bytes / 2**20:.0f} MB on top of the "
+                f"{current / 2**20:.0f} MB in use, which is over the memory budget of {self.budget_bytes / 2**20:.0f} MB.")
+
+
+def pyplot_figures():
+    # Figures left registered with pyplot are only freed by plt.close
+    if 'matplotlib.pyplot' not in sys.modules:
+        return []
+    from matplotlib._pylab_helpers import Gcf
+    return [(f"pyplot figure {manager.num}", manager.canvas.figure) for manager in Gcf.get_all_fig_managers()]
+
+
+def project_psd_bytes(rows, channels, settings):
+    # Channels go through welch a page at a time: the copy it makes of a
+    # page and its segment buffers (complex, one per segment), next to the
+    # spectra of every channel
+    page = min(channels, PAGE_CHANNELS)
+    step = max(settings.nperseg - settings.noverlap(), 1)
+    segments = max(rows // step, 1)
+    return rows * page * 8 * 2 + segments * settings.fft_length() * page * 16 + settings.fft_length() * channels * 8
+
+
+def project_csd_bytes(rows, channels, settings):
+    # One chunk of segment FFTs and its einsum temporaries, and the
+    # (n_freq, n_channels, n_channels) complex result
+    n_freq = settings.fft_length()
+    return 3 * max(CHUNK_SPECTRA, channels) * n_freq * 16 + 2 * n_freq * channels**2 * 16
+
+
+def project_glevel_bytes(rows, channels, figures):
+    # The envelopes are small, what grows is the time axis copy and one
+    # Agg buffer per 10x10 inch figure
+    return rows * 8 + channels * 4000 * 16 + figures * 1000 * 1040 * 4
+
+
+def project_load_bytes(file_path):
+    # Parsing text keeps the raw chunks and the concatenated frame around,
+    # roughly three times the file size for CSV and more for Excel.
+    # Files already in the record cache are memory-mapped instead.
+    from record_cache import record_dir
+    if os.path.exists(os.path.join(record_dir(file_path), 'columns.json')):
+        return 0
+    size = os.path.getsize(file_path)
+    return size * (6 if file_path.endswith('.xlsx') else 3)
+
+
+MEMORY = MemoryLedger()
+MEMORY.add_source('figures', pyplot_figures)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Fractional-octave bands (base-10, IEC 61260 / ANSI S1.11 centre frequencies)
+# from narrowband PSDs. Every band is a weighted sum of PSD bins, so all
+# bands of all channels come out of one sparse matrix multiply.
+
+FRACTIONS = {'1/1': 1, '1/3': 3, '1/6': 6, '1/12': 12}
+OCTAVE_RATIO = 10 ** (3 / 10)
+
+_matrix_cache = {}
+
+
+def band_edges(fraction, fmin, fmax):
+    # (centres, lower, upper) of the 1/fraction octave bands overlapping [fmin, fmax]
+    b = fraction
+    lo = int(np.floor(b * np.log(fmin / 1000) / np.log(OCTAVE_RATIO))) - 1
+    hi = int(np.ceil(b * np.log(fmax / 1000) / np.log(OCTAVE_RATIO))) + 1
+    x = np.arange(lo, hi + 1)
+    if b % 2:
+        centres = 1000 * OCTAVE_RATIO ** (x / b)
+    else:
+        centres = 1000 * OCTAVE_RATIO ** ((2 * x + 1) / (2 * b))
+    lower = centres * OCTAVE_RATIO ** (-1 / (2 * b))
+    upper = centres * OCTAVE_RATIO ** (1 / (2 * b))
+    keep = (upper > fmin) & (lower < fmax)
+    return centres[keep], lower[keep], upper[keep]
+
+
+def band_matrix(f, fraction):
+    # Sparse (n_bands, n_freq) matrix of how many Hz of each PSD bin fall in
+    # each band, so W @ Pxx integrates the density over the bands. Bins are
+    # split between neighbouring bands in proportion to their overlap.
+    # Cached per frequency grid and fraction, the grid rarely changes.
+    f = np.asarray(f)
+    key = (len(f), float(f[0]), float(f[-1]), fraction)
+    if key in _matrix_cache:
+        return _matrix_cache[key]
+
+    df = f[1] - f[0]
+    bin_lo = np.maximum(f - df / 2, 0)
+    bin_hi = f + df / 2
+    centres, lower, upper = band_edges(fraction, df / 2, f[-1])
+    # Bands narrower than a bin would just be a slice of one bin's density,
+    # so the bands start at the first one at least a bin wide
+    keep = upper - lower >= df
+    centres, lower, upper = centres[keep], lower[keep], upper[keep]
+
+    rows, cols, weights = [], [], []
+    for k, (band_lo, band_hi) in enumerate(zip(lower, upper)):
+        first = max(np.searchsorted(bin_hi, band_lo, side='right'), 0)
+        last = min(np.searchsorted(bin_lo, band_hi, side='left'), len(f))
+        overlap = np.minimum(bin_hi[first:last], band_hi) - np.maximum(bin_lo[first:last], band_lo)
+        rows.append(np.full(last - first, k))
+        cols.append(np.arange(first, last))
+        weights.append(np.clip(overlap, 0, None))
+
+    W = sparse.csr_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(len(centres), len(f)))
+    _matrix_cache[key] = (centres, lower, upper, W)
+    return _matrix_cache[key]
+
+
+def octave_bands(f, Pxx, fraction):
+    # Band RMS [G] and band-averaged PSD [G^2/Hz] for every column of Pxx
+    # (a one-sided density spectrum). Returns centres, lower, upper, rms, psd.
+    centres, lower, upper, W = band_matrix(f, fraction)
+    power = W @ Pxx
+    return centres, lower, upper, np.sqrt(power), power / (upper - lower)[:, None]
+
+
+def band_table(centres, lower, upper, rms, channel_names):
+    table = pd.DataFrame({'centre_hz': centres, 'lower_hz': lower, 'upper_hz': upper})
+    for k, name in enumerate(channel_names):
+        table[f'{name} rms_g'] = rms[:, k]
+    return table
@@ -0,0 +1,129 @@
+import tkinter as tk
+from tkinter import ttk, filedialog
+
+from perf_trace import TRACE
+from memory_telemetry import MEMORY, rss_bytes
+
+
+class PerfPanel(ttk.Frame):
+    # Collapsible status panel showing how long each traced stage took.
+    # The trace is filled from worker threads too, so it is polled from
+    # the Tk loop instead of pushing updates into the widgets.
+    def __init__(self, master, trace=TRACE, interval=500):
+        super().__init__(master)
+        self.trace = trace
+        self.interval = interval
+        self.shown_version = None
+        self.expanded = False
+
+        bar = ttk.Frame(self)
+        bar.pack(fill='x')
+        self.toggle_button = ttk.Button(bar, text="Show Timings", command=self.toggle)
+        self.toggle_button.pack(side=tk.LEFT, padx=5, pady=2)
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side=tk.LEFT, padx=5)
+        ttk.Button(bar, text="Export Trace", command=self.export_trace).pack(side=tk.RIGHT, padx=5, pady=2)
+
+        columns = ('count', 'last', 'total', 'samples', 'rate')
+        self.table = ttk.Treeview(self, columns=columns, height=8)
+        self.table.heading('#0', text="Stage")
+        for column, text in zip(columns, ("Runs", "Last [ms]", "Total [ms]", "Samples", "MSamples/s")):
+            self.table.heading(column, text=text)
+            self.table.column(column, width=100, anchor='e')
+
+        self.after(self.interval, self.poll)
+
+    def toggle(self):
+        self.expanded = not self.expanded
+        if self.expanded:
+            self.table.pack(fill='x')
+            self.toggle_button.config(text="Hide Timings")
+            self.refresh()
+        else:
+            self.table.pack_forget()
+            self.toggle_button.config(text="Show Timings")
+
+    def poll(self):
+        if self.trace.version != self.shown_version:
+            self.refresh()
+        self.after(self.interval, self.poll)
+
+    def refresh(self):
+        self.shown_version = self.trace.version
+        if self.trace.events:
+            last = self.trace.events[-1]
+            self.status.config(text=f"{last['name']}: {last['dur'] / 1000:.1f} ms")
+        if not self.expanded:
+            return
+
+        self.table.delete(*self.table.get_children())
+        for name, s in sorted(self.trace.summary().items()):
+            rate = s['msamples_per_s']
+            self.table.insert('', 'end', text=name, values=(
+                s['count'],
+                f"{s['last_s'] * 1000:.1f}",
+                f"{s['total_s'] * 1000:.1f}",
+                s['samples'] if s['samples'] is not None else "",
+                f"{rate:.1f}" if rate is not None else "",
+            ))
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if path:
+            self.trace.save(path)
+
+
+class MemoryPanel(ttk.Frame):
+    # Collapsible panel with the process RSS against the budget and the
+    # bytes held by each loaded record, derived array, cache and figure.
+    # Mapped bytes live in the cache files and are paged in on demand.
+    def __init__(self, master, ledger=MEMORY, interval=2000):
+        super().__init__(master)
+        self.ledger = ledger
+        self.interval = interval
+        self.expanded = False
+
+        bar = ttk.Frame(self)
+        bar.pack(fill='x')
+        self.toggle_button = ttk.Button(bar, text="Show Memory", command=self.toggle)
+        self.toggle_button.pack(side=tk.LEFT, padx=5, pady=2)
+        self.status = ttk.Label(bar, text="")
+        self.status.pack(side=tk.LEFT, padx=5)
+
+        self.table = ttk.Treeview(self, columns=('memory', 'mapped'), height=8)
+        self.table.heading('#0', text="Object")
+        self.table.heading('memory', text="In memory [MB]")
+        self.table.heading('mapped', text="Mapped [MB]")
+        for column in ('memory', 'mapped'):
+            self.table.column(column, width=120, anchor='e')
+
+        self.poll()
+
+    def toggle(self):
+        self.expanded = not self.expanded
+        if self.expanded:
+            self.table.pack(fill='x')
+            self.toggle_button.config(text="Hide Memory")
+            self.refresh()
+        else:
+            self.table.pack_forget()
+            self.toggle_button.config(text="Show Memory")
+
+    def poll(self):
+        self.status.config(text=f"RSS {rss_bytes() / 2**20:.0f} MB of {self.ledger.budget_bytes / 2**20:.0f} MB budget")
+        if self.expanded:
+            self.refresh()
+        self.after(self.interval, self.poll)
+
+    def refresh(self):
+        self.table.delete(*self.table.get_children())
+        categories = {}
+        for category, name, in_memory, mapped in self.ledger.report():
+            if category not in categories:
+                categories[category] = [self.table.insert('', 'end', text=category, open=True), 0, 0]
+            parent = categories[category]
+            parent[1] += in_memory
+            parent[2] += mapped
+            self.table.insert(parent[0], 'end', text=name, values=(f"{in_memory / 2**20:.1f}", f"{mapped / 2**20:.1f}"))
+        for item, in_memory, mapped in categories.values():
+            self.table.item(item, values=(f"{in_memory / 2**20:.1f}", f"{mapped / 2**20:.1f}"))
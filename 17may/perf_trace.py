@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Stage timings recorded as Chrome trace events ("X" complete events), so an
+# exported trace opens in chrome://tracing or Perfetto. Timestamps are wall
+# clock microseconds so events coming back from worker processes line up.
+
+
+def now_us():
+    return time.time_ns() // 1000
+
+
+def make_event(name, start_us, duration_s, samples=None, **args):
+    if samples is not None:
+        args['samples'] = int(samples)
+        if duration_s > 0:
+            args['msamples_per_s'] = samples / duration_s / 1e6
+    return {
+        'name': name,
+        'ph': 'X',
+        'ts': start_us,
+        'dur': duration_s * 1e6,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': args,
+    }
+
+
+@contextmanager
+def timed(name, samples=None, **args):
+    # Yields a dict of event args the block can still fill in (e.g. samples
+    # once the data is loaded). The finished event is left in info['event'],
+    # which is how worker processes send theirs back to the parent.
+    info = dict(args, samples=samples)
+    start_us, start = now_us(), time.perf_counter()
+    try:
+        yield info
+    finally:
+        duration = time.perf_counter() - start
+        info['event'] = make_event(name, start_us, duration, **info)
+
+
+class Trace:
+    def __init__(self, max_events=100000):
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.Lock()
+        self.version = 0
+
+    @contextmanager
+    def stage(self, name, samples=None, **args):
+        # Safe to use from any thread. A stage that raises is still recorded,
+        # with the exception type under 'error'.
+        try:
+            with timed(name, samples, **args) as info:
+                try:
+                    yield info
+                except BaseException as e:
+                    info['error'] = type(e).__name__
+                    raise
+        finally:
+            self.add_events([info['event']])
+
+    def add_events(self, events):
+        with self.lock:
+            self.events.extend(events)
+            self.version += 1
+
+    def summary(self):
+        # name -> count, total and last duration (s), last samples and throughput
+        stats = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            s = stats.setdefault(event['name'], {'count': 0, 'total_s': 0.0})
+            s['count'] += 1
+            s['total_s'] += event['dur'] / 1e6
+            s['last_s'] = event['dur'] / 1e6
+            s['samples'] = event['args'].get('samples')
+            s['msamples_per_s'] = event['args'].get('msamples_per_s')
+        return stats
+
+    def save(self, path):
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+TRACE = Trace()
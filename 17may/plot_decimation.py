@@ -0,0 +1,87 @@
+import numpy as np
+
+
+def minmax_envelope(x, y, width, xlim=None):
+    # Reduce a trace to a min/max pair per pixel column of the axes.
+    # The points kept are real samples in time order, so spikes and the
+    # outline of the trace look the same as the full-resolution plot.
+    x = np.asarray(x)
+
+    if xlim is not None:
+        # One extra sample on each side so the line runs off the edges
+        lo = max(np.searchsorted(x, xlim[0], side='left') - 1, 0)
+        hi = min(np.searchsorted(x, xlim[1], side='right') + 1, len(x))
+        x = x[lo:hi]
+        y = y[lo:hi]
+    y = np.asarray(y)
+
+    n = len(y)
+    columns = max(int(width), 1)
+    if n <= 2 * columns:
+        return x, y
+
+    block = -(-n // columns)
+    usable = (n // block) * block
+    idx = _block_extremes(y[:usable].reshape(-1, block), 0)
+    if usable < n:
+        idx = np.concatenate([idx, _block_extremes(y[usable:].reshape(1, -1), usable)])
+
+    return x[idx], y[idx]
+
+
+def _block_extremes(blocks, start):
+    imin = blocks.argmin(axis=1)
+    imax = blocks.argmax(axis=1)
+    offsets = start + np.arange(blocks.shape[0]) * blocks.shape[1]
+
+    idx = np.empty(2 * blocks.shape[0], dtype=np.intp)
+    idx[0::2] = offsets + np.minimum(imin, imax)
+    idx[1::2] = offsets + np.maximum(imin, imax)
+    return idx
+
+
+class EnvelopeLine:
+    # A Line2D that only ever holds the envelope for the current view.
+    # Zooming/panning or resizing the canvas recomputes it, from the
+    # pyramid levels when there is one and from the samples otherwise.
+    # y may be the raw (uncalibrated) samples, scale is applied to the envelope.
+    def __init__(self, ax, x, y, scale=1.0, pyramid=None, channel=None, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = y
+        self.scale = scale
+        self.pyramid = pyramid
+        self.channel = channel
+
+        xd, yd = self.envelope(None)
+        self.line, = ax.plot(xd, yd, **kwargs)
+
+        self._xlim_cid = ax.callbacks.connect('xlim_changed', lambda ax: self.update())
+        self._resize_cid = ax.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+
+    def envelope(self, xlim):
+        width = self.ax.bbox.width
+        if self.pyramid is not None:
+            result = self.pyramid.envelope(self.channel, self.x, xlim, width, self.scale)
+            if result is not None:
+                return result
+        xd, yd = minmax_envelope(self.x, self.y, width, xlim)
+        return xd, yd * self.scale
+
+    def set_source(self, x, y, scale=1.0, pyramid=None, channel=None):
+        # Swap in new data but keep the Line2D and its style
+        self.x = np.asarray(x)
+        self.y = y
+        self.scale = scale
+        self.pyramid = pyramid
+        self.channel = channel
+        self.line.set_data(*self.envelope(None))
+
+    def update(self):
+        xd, yd = self.envelope(self.ax.get_xlim())
+        self.line.set_data(xd, yd)
+        self.ax.figure.canvas.draw_idle()
+
+    def disconnect(self):
+        self.ax.callbacks.disconnect(self._xlim_cid)
+        self.ax.figure.canvas.mpl_disconnect(self._resize_cid)
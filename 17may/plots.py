@@ -0,0 +1,131 @@
+import numpy as np
+from matplotlib.figure import Figure
+
+from analysis import channel_label
+from plot_decimation import EnvelopeLine
+from perf_trace import TRACE
+
+# Drawing of the G-level and PSD figures, used by the GUI on its pooled
+# figures and by the batch command line on fresh ones. artists holds the
+# lines from a previous call on the same axes, which are updated in place.
+
+
+def new_figure(nrows=3, figsize=(10, 10)):
+    # Figure instead of plt.subplots, pyplot would keep every figure alive
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots(nrows, 1)
+
+
+def highlight_extreme_peaks(ax, line):
+    # Marks the largest and smallest value of line, returns the added artists
+    xdata = line.get_xdata()
+    ydata = line.get_ydata()
+    if len(ydata) == 0:
+        return []
+    with TRACE.stage('highlight_extreme_peaks', samples=len(ydata)):
+        max_idx = np.argmax(ydata)
+        min_idx = np.argmin(ydata)
+    return [
+        *ax.plot(xdata[max_idx], ydata[max_idx], marker='o', markersize=2, color='red'),
+        ax.text(xdata[max_idx], ydata[max_idx], f'{ydata[max_idx]:}', fontsize=8, color='red', ha='left', va='bottom', bbox=dict(facecolor='white', alpha=0.5)),
+        *ax.plot(xdata[min_idx], ydata[min_idx], marker='o', markersize=2, color='blue'),
+        ax.text(xdata[min_idx], ydata[min_idx], f'{ydata[min_idx]:}', fontsize=8, color='blue', ha='left', va='top', bbox=dict(facecolor='white', alpha=0.5)),
+    ]
+
+
+def _clear_peaks(artists, j):
+    # Markers from the previous plot on a reused axis, taken out before the
+    # limits are worked out again so they do not count in them
+    for artist in artists.pop(('peaks', j), []):
+        artist.remove()
+
+
+def _mark_peaks(ax, artists, j, line):
+    _clear_peaks(artists, j)
+    artists[('peaks', j)] = highlight_extreme_peaks(ax, line)
+
+
+def plot_glevel_axes(axs, artists, time, channel_data, first, scale, pyramid=None, velocity=None, ylabel="G-Levels", envelopes=None):
+    # channel_data holds the raw channels, first is the column of the top axis.
+    # velocity is a (time, velocity) pair drawn on a twin axis, or None.
+    # envelopes maps a channel to a saved, already scaled (x, y) envelope that
+    # is drawn instead of time and channel_data, which may then be None.
+    for j, ax in enumerate(axs):
+        if envelopes is not None:
+            missing = first + j not in envelopes
+        else:
+            missing = first + j >= channel_data.shape[1]
+        if missing:
+            # The last figure of a run may have fewer than three channels
+            ax.set_visible(False)
+            ax_velocity, _ = artists.pop(('velocity', j), (None, None))
+            if ax_velocity is not None:
+                ax_velocity.remove()
+            continue
+        ax.set_visible(True)
+        label = channel_label(first + j)
+        # Only the per-pixel min/max envelope goes to Agg, recomputed on zoom
+        if envelopes is not None:
+            source = dict(x=envelopes[first+j][0], y=envelopes[first+j][1], scale=1.0, pyramid=None, channel=first+j)
+        else:
+            source = dict(x=time, y=channel_data.iloc[:, first+j].to_numpy(), scale=scale, pyramid=pyramid, channel=first+j)
+        envelope = artists.get(('glevel', j))
+        if envelope is None:
+            envelope = EnvelopeLine(ax, **source, label=label)
+            artists[('glevel', j)] = envelope
+            ax.set_xlabel("Time")
+        else:
+            envelope.set_source(**source)
+            envelope.line.set_label(label)
+            _clear_peaks(artists, j)
+            # A toolbar zoom on the old channel turned autoscaling off
+            ax.set_autoscale_on(True)
+            ax.relim()
+            ax.autoscale_view()
+        ax.set_ylabel(ylabel)
+        ax.legend(loc='upper right')
+
+        ax_velocity, velocity_line = artists.get(('velocity', j), (None, None))
+        if velocity is not None:
+            velocity_time, velocity_values = velocity
+            if ax_velocity is None:
+                ax_velocity = ax.twinx()
+                velocity_line, = ax_velocity.plot(velocity_time, velocity_values, label='Velocity', linestyle='--', color='red')
+                ax_velocity.set_ylabel("Velocity")
+                ax_velocity.legend(loc='upper left')
+                artists[('velocity', j)] = (ax_velocity, velocity_line)
+            else:
+                velocity_line.set_data(velocity_time, velocity_values)
+                ax_velocity.set_autoscale_on(True)
+                ax_velocity.relim()
+                ax_velocity.autoscale_view()
+        elif ax_velocity is not None:
+            ax_velocity.remove()
+            del artists[('velocity', j)]
+
+        _mark_peaks(ax, artists, j, envelope.line)
+
+
+def plot_psd_axes(axs, artists, f, Pxx, first, ylabel="PSD [G^2/Hz]"):
+    # Pxx has one column per channel, first is the column of the top axis
+    for j, ax in enumerate(axs):
+        ax.set_visible(first + j < Pxx.shape[1])
+        if not ax.get_visible():
+            continue
+        label = channel_label(first + j)
+        line = artists.get(('psd', j))
+        if line is None:
+            line, = ax.semilogy(f, Pxx[:, first + j], label=label)
+            artists[('psd', j)] = line
+            ax.set_xlabel("Frequency [Hz]")
+        else:
+            line.set_data(f, Pxx[:, first + j])
+            line.set_label(label)
+            _clear_peaks(artists, j)
+            ax.set_autoscale_on(True)
+            ax.relim()
+            ax.autoscale_view()
+        ax.set_ylabel(ylabel)
+        ax.legend(loc='upper right')
+
+        _mark_peaks(ax, artists, j, line)
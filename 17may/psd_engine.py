@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# The one place Welch spectra are computed, for the GUI, the batch command
+# line and everything built on the spectra. scipy is imported on first use:
+# the GUI builds its settings form from this module at startup.
+
+WINDOWS = ('hann', 'hamming', 'blackman', 'blackmanharris', 'flattop', 'boxcar')
+DETRENDS = ('constant', 'linear', 'none')
+AVERAGES = ('mean', 'median')
+SCALINGS = ('density', 'spectrum')
+CHUNK_SPECTRA = 256 * 24      # segment spectra per chunk, shared among the channels
+
+
+@dataclass
+class SpectralSettings:
+    nperseg: int = 2048
+    window: str = 'hann'
+    overlap: float = 50.0         # percent of nperseg
+    nfft: int = None              # None picks the next fast length >= nperseg
+    detrend: str = 'constant'
+    average: str = 'mean'
+    scaling: str = 'density'
+    onesided: bool = True
+
+    def noverlap(self):
+        return min(int(self.nperseg * self.overlap / 100), self.nperseg - 1)
+
+    def fft_length(self):
+        # Never shorter than a segment (that would truncate it) and always a
+        # length the FFT handles fast, odd primes can be many times slower
+        from scipy.fft import next_fast_len
+        return next_fast_len(max(self.nfft or self.nperseg, self.nperseg), real=True)
+
+    def validate(self):
+        if self.nperseg < 2:
+            raise ValueError("nperseg must be at least 2")
+        if not 0 <= self.overlap < 100:
+            raise ValueError("overlap must be between 0 and 100 %")
+        for value, allowed in ((self.window, WINDOWS), (self.detrend, DETRENDS),
+                               (self.average, AVERAGES), (self.scaling, SCALINGS)):
+            if value not in allowed:
+                raise ValueError(f"{value!r} is not one of {', '.join(allowed)}")
+
+    def ylabel(self, unit='G'):
+        unit = f"({unit})" if '/' in unit else unit
+        return f"PSD [{unit}^2/Hz]" if self.scaling == 'density' else f"Power [{unit}^2]"
+
+
+def welch_psd(values, sampling_freq, settings, scale=1.0):
+    # Welch estimate of every column of values at once. scale is the
+    # calibration factor, applied to the spectra rather than the samples.
+    # Returns f and Pxx of shape (n_freq, n_channels).
+    from scipy.signal import welch
+    settings.validate()
+    f, Pxx = welch(np.asarray(values), fs=sampling_freq, window=settings.window,
+                   nperseg=settings.nperseg, noverlap=settings.noverlap(), nfft=settings.fft_length(),
+                   detrend=False if settings.detrend == 'none' else settings.detrend,
+                   return_onesided=settings.onesided, scaling=settings.scaling,
+                   average=settings.average, axis=0)
+    return f, Pxx * scale**2
+
+
+def segment_spectra(values, sampling_freq, settings, scale=1.0, chunk_spectra=CHUNK_SPECTRA):
+    # Windowed FFT of every Welch segment of every column, in chunks of
+    # segments so a long record never holds all of them at once. A chunk
+    # holds chunk_spectra spectra whatever the channel count. Yields
+    # arrays of shape (n_segments, n_channels, n_freq), scaled so that the
+    # mean of conj(X_i) * X_j over segments is the Welch CSD of i and j.
+    from scipy.fft import rfft, fft
+    from scipy.signal import get_window, detrend
+    settings.validate()
+    values = np.asarray(values)
+    nperseg, nfft = settings.nperseg, settings.fft_length()
+    if len(values) < nperseg:
+        raise ValueError("the range is shorter than one segment")
+    step = nperseg - settings.noverlap()
+    chunk_segments = max(chunk_spectra // max(values.shape[1], 1), 1)
+    win = get_window(settings.window, nperseg)
+    if settings.scaling == 'density':
+        norm = np.sqrt(scale**2 / (sampling_freq * (win**2).sum()))
+    else:
+        norm = abs(scale) / win.sum()
+    transform = rfft if settings.onesided else fft
+
+    segments = np.lib.stride_tricks.sliding_window_view(values, nperseg, axis=0)[::step]
+    for start in range(0, len(segments), chunk_segments):
+        chunk = segments[start:start + chunk_segments]
+        if settings.detrend != 'none':
+            chunk = detrend(chunk, type=settings.detrend, axis=-1)
+        X = transform(chunk * win, n=nfft, axis=-1)
+        X *= norm
+        yield X
+
+
+def spectral_frequencies(sampling_freq, settings):
+    from scipy.fft import rfftfreq, fftfreq
+    n = settings.fft_length()
+    return rfftfreq(n, 1 / sampling_freq) if settings.onesided else fftfreq(n, 1 / sampling_freq)
+
+
+def fold_onesided(P, settings):
+    # Averaged segment powers to a one-sided spectrum: the negative
+    # frequencies are folded in as welch does, DC and Nyquist have none
+    if settings.onesided:
+        last = None if settings.fft_length() % 2 else -1
+        P[1:last] *= 2
+    return P
+
+
+def csd_matrix(values, sampling_freq, settings, scale=1.0):
+    # Full cross-spectral density matrix of all columns, S[f, i, j] is the
+    # Welch CSD of column i with column j (conj(X_i) * X_j, as scipy's csd).
+    # One pass over the segment FFTs, every pair comes out of the same einsum.
+    # Segments are always mean-averaged, a median of complex values is not
+    # a CSD. Returns f and S of shape (n_freq, n_channels, n_channels).
+    S = 0
+    count = 0
+    for X in segment_spectra(values, sampling_freq, settings, scale):
+        S = S + np.einsum('sif,sjf->fij', X.conj(), X, optimize=True)
+        count += len(X)
+    S /= count
+    return spectral_frequencies(sampling_freq, settings), fold_onesided(S, settings)
+
+
+def coherence_matrix(S):
+    # Magnitude-squared coherence of every pair from a CSD matrix
+    auto = np.real(np.einsum('fii->fi', S))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        C = np.abs(S)**2 / (auto[:, :, None] * auto[:, None, :])
+    return np.nan_to_num(C)
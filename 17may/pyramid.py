@@ -0,0 +1,117 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from perf_trace import TRACE
+
+BASE_BLOCK = 32    # samples per block at level 0, finer zooms read the raw samples
+MIN_BLOCKS = 256   # no point in levels shorter than this
+PYRAMID_DIR = 'pyramid'
+
+
+def level_sizes(n_samples):
+    sizes = [-(-n_samples // BASE_BLOCK)]
+    while sizes[-1] >= 2 * MIN_BLOCKS:
+        sizes.append(-(-sizes[-1] // 2))
+    return sizes
+
+
+def build_pyramid(record_path, workers=None):
+    # Per-channel min/max at block sizes BASE_BLOCK * 2**k. Each level is
+    # an array of shape (2, n_channels, n_blocks) written straight to disk,
+    # so only one channel's levels per worker are ever held in memory.
+    values = np.load(os.path.join(record_path, 'values.npy'), mmap_mode='r')
+    channels = values[1:]
+    sizes = level_sizes(channels.shape[1])
+
+    path = os.path.join(record_path, PYRAMID_DIR)
+    os.makedirs(path, exist_ok=True)
+    levels = [np.lib.format.open_memmap(os.path.join(path, f'level_{k}.npy'), mode='w+', dtype=np.float64,
+                                        shape=(2, channels.shape[0], size))
+              for k, size in enumerate(sizes)]
+
+    def build_channel(ch):
+        with TRACE.stage('build_pyramid_channel', samples=channels.shape[1], channel=ch):
+            y = np.asarray(channels[ch])
+            full = len(y) // BASE_BLOCK * BASE_BLOCK
+            blocks = y[:full].reshape(-1, BASE_BLOCK)
+            mins, maxs = blocks.min(axis=1), blocks.max(axis=1)
+            if full < len(y):
+                tail = y[full:]
+                mins = np.append(mins, tail.min())
+                maxs = np.append(maxs, tail.max())
+
+            for k, level in enumerate(levels):
+                if k > 0:
+                    mins = _halve(mins, np.minimum)
+                    maxs = _halve(maxs, np.maximum)
+                level[0, ch] = mins
+                level[1, ch] = maxs
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(build_channel, range(channels.shape[0])))
+
+    for level in levels:
+        level.flush()
+    # Written last, a pyramid without levels.json is treated as missing
+    with open(os.path.join(path, 'levels.json'), 'w') as f:
+        json.dump({'base_block': BASE_BLOCK, 'levels': len(levels)}, f)
+
+
+def _halve(a, combine):
+    even = len(a) // 2 * 2
+    out = combine(a[0:even:2], a[1:even:2])
+    if len(a) % 2:
+        out = np.append(out, a[-1])
+    return out
+
+
+class Pyramid:
+    def __init__(self, levels, base_block):
+        self.levels = levels
+        self.base_block = base_block
+
+    @classmethod
+    def open(cls, record_path):
+        path = os.path.join(record_path, PYRAMID_DIR)
+        try:
+            with open(os.path.join(path, 'levels.json')) as f:
+                meta = json.load(f)
+            levels = [np.load(os.path.join(path, f'level_{k}.npy'), mmap_mode='r') for k in range(meta['levels'])]
+        except (OSError, ValueError):
+            return None
+        return cls(levels, meta['base_block'])
+
+    def envelope(self, channel, time, xlim, width, scale=1.0):
+        # Min/max pair per pixel column read from the coarsest level that still
+        # has at least one block per column. Returns None when the view is so
+        # narrow that the raw samples should be used instead.
+        n = len(time)
+        if xlim is None:
+            lo, hi = 0, n
+        else:
+            lo = max(np.searchsorted(time, xlim[0], side='left') - 1, 0)
+            hi = min(np.searchsorted(time, xlim[1], side='right') + 1, n)
+
+        columns = max(int(width), 1)
+        per_column = (hi - lo) / columns
+        if per_column < self.base_block:
+            return None
+
+        k = min(int(np.log2(per_column / self.base_block)), len(self.levels) - 1)
+        block = self.base_block << k
+        first, last = lo // block, -(-hi // block)
+        mins = self.levels[k][0, channel, first:last]
+        maxs = self.levels[k][1, channel, first:last]
+
+        group = max(len(mins) // columns, 1)
+        starts = np.arange(0, len(mins), group)
+        xs = np.asarray(time[np.minimum((first + starts) * block, n - 1)])
+
+        xd = np.repeat(xs, 2)
+        yd = np.empty(2 * len(starts))
+        yd[0::2] = np.minimum.reduceat(mins, starts) * scale
+        yd[1::2] = np.maximum.reduceat(maxs, starts) * scale
+        return xd, yd
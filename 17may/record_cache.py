@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '.glevel_cache'
+DERIVED_DIR = 'derived'
+
+
+def record_dir(file_path):
+    # One directory per source file version, next to the source file
+    file_path = os.path.abspath(file_path)
+    st = os.stat(file_path)
+    key = hashlib.sha1(f'{file_path}:{st.st_size}:{st.st_mtime_ns}'.encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(file_path), CACHE_DIR, f'{os.path.basename(file_path)}-{key}')
+
+
+def open_record(path):
+    # The record in path as a DataFrame (memory-mapped, read-only) or None
+    try:
+        with open(os.path.join(path, 'columns.json')) as f:
+            columns = json.load(f)
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame(values.T, columns=columns, copy=False)
+
+
+def load_record(file_path):
+    # Returns the cached DataFrame (memory-mapped, read-only) or None
+    path = record_dir(file_path)
+    return open_record(path), path
+
+
+def derived_dir(record_path, name):
+    # Records computed from another record (filtered, decimated, ...) live
+    # inside its directory, so they go away with it
+    return os.path.join(record_path, DERIVED_DIR, name)
+
+
+def create_values(path, shape):
+    # Writable memory-mapped values.npy of (n_columns, n_rows) for records
+    # that are written in chunks; finish_record must follow
+    os.makedirs(path, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(path, 'values.npy'), mode='w+', dtype=np.float64, shape=shape)
+
+
+def finish_record(path, columns):
+    # Written last, a record without columns.json is treated as missing
+    with open(os.path.join(path, 'columns.json'), 'w') as f:
+        json.dump([str(c) for c in columns], f)
+
+
+def store_record(file_path, data):
+    # Values are stored column by column so each channel is contiguous on disk
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes):
+        return None
+    path = record_dir(file_path)
+    try:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'values.npy'), np.ascontiguousarray(data.to_numpy(dtype=np.float64).T))
+        finish_record(path, data.columns)
+    except OSError:
+        return None
+    return path
@@ -0,0 +1,79 @@
+import io
+import multiprocessing
+import os
+import pickle
+from collections import deque
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor
+
+from docx import Document
+from docx.shared import Inches
+
+from perf_trace import TRACE, timed
+
+
+def render_png(fig_state, dpi=None):
+    # Runs in a worker process. The unpickled figure has no GUI canvas,
+    # so savefig renders it with Agg. The timing goes back with the image.
+    with timed('render_png') as info:
+        fig = pickle.loads(fig_state)
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=dpi)
+    return buf.getvalue(), info['event']
+
+
+def _collect(title, future):
+    png, event = future.result()
+    TRACE.add_events([event])
+    return title, png
+
+
+def render_figures(plots, workers=None, dpi=None):
+    # plots is an iterable of (title, figure); yields (title, PNG bytes) in
+    # order. A figure is pulled from plots only when a slot frees up, so with
+    # a generator just a couple of figures per worker exist at once however
+    # many are exported.
+    plots = iter(plots)
+    workers = workers or os.cpu_count()
+    if workers > 1:
+        # A single figure is not worth starting worker processes for
+        head = list(islice(plots, 2))
+        if len(head) < 2:
+            workers = 1
+        plots = chain(head, plots)
+    if workers <= 1:
+        for title, fig in plots:
+            with TRACE.stage('render_png'):
+                buf = io.BytesIO()
+                fig.savefig(buf, format='png', dpi=dpi)
+            yield title, buf.getvalue()
+        return
+
+    # spawn rather than fork, the parent may be running a Tk main loop
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = deque()
+        for title, fig in plots:
+            if len(pending) >= 2 * workers:
+                yield _collect(*pending.popleft())
+            # Only the pickled state is kept, the figure can go once sent
+            pending.append((title, executor.submit(render_png, pickle.dumps(fig), dpi)))
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def write_report(save_path, plots, workers=None):
+    # plots is an iterable of (title, figure) in document order, best a
+    # generator so figures are made as they are rendered. Returns the number
+    # of figures written.
+    doc = Document()
+    doc.add_heading('G-Levels and PSD Plots', 0)
+
+    # Figures are rendered by worker processes into memory and added as they come back
+    count = 0
+    for title, png in render_figures(plots, workers=workers):
+        doc.add_paragraph(title)
+        doc.add_picture(io.BytesIO(png), width=Inches(6))
+        count += 1
+
+    doc.save(save_path)
+    return count
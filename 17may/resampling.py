@@ -0,0 +1,28 @@
+# Anti-aliased decimation of whole records with scipy's polyphase FIR, in
+# chunks of samples with enough margin on both sides that every output
+# sample sees the full filter, so the chunks join up exactly.
+
+FACTORS = (1, 5, 25)
+CHUNK = 2**18
+
+
+def decimated_length(n, q):
+    return -(-n // q)
+
+
+def decimate_channels(x, out, q, chunk=CHUNK):
+    # Decimates the rows of x (n_channels, n_samples) by q into out
+    # (n_channels, decimated_length(n_samples, q)), which may be memory-mapped.
+    # resample_poly's filter reaches 10 * q samples either side, the margin
+    # is one more decimated sample than that so chunks start on a multiple of q.
+    from scipy.signal import resample_poly
+    n = x.shape[1]
+    chunk = chunk // q * q
+    margin = 11 * q
+    for start in range(0, n, chunk):
+        lo, hi = max(start - margin, 0), min(start + chunk + margin, n)
+        y = resample_poly(x[:, lo:hi], 1, q, axis=-1)
+        offset = (start - lo) // q
+        count = decimated_length(min(chunk, n - start), q)
+        out[:, start // q:start // q + count] = y[:, offset:offset + count]
+    return out
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from perf_trace import TRACE, timed
+
+# Extra runs for the overlay comparison are loaded (parsed into the record
+# cache on first use) and get their PSD in worker processes. Only the record
+# path and the spectra come back; the parent maps the record itself.
+# With an analysis server the same is asked of the server instead, which
+# runs on this machine and writes the same record cache.
+
+
+def analyze_run(file_path, sensitivity, sampling_freq, settings):
+    # Runs in a worker process. The timing goes back with the result.
+    from analysis import load_data, cached_psd
+    with timed('analyze_run', file=os.path.basename(file_path)) as info:
+        data, record_path = load_data(file_path)
+        f, Pxx = cached_psd(data, record_path, sensitivity, sampling_freq, settings)
+        info['samples'] = data.size
+    # Records that could not be cached have nothing the parent could map
+    return {
+        'record_path': record_path,
+        'data': data if record_path is None else None,
+        'f': f,
+        'Pxx': Pxx,
+        'event': info['event'],
+    }
+
+
+def analyze_run_on_server(url, file_path, sensitivity, sampling_freq, settings):
+    # Runs in a thread, the server does the work
+    from analysis_server import AnalysisClient
+    with timed('analyze_run', file=os.path.basename(file_path), server=url) as info:
+        f, Pxx, record_path = AnalysisClient(url).psd(file_path, sensitivity, sampling_freq, settings)
+    if record_path is None:
+        raise ValueError("the server could not cache this run")
+    return {'record_path': record_path, 'data': None, 'f': f, 'Pxx': Pxx, 'event': info['event']}
+
+
+class RunLoader:
+    # Submits runs to a small pool of worker processes. poll() hands back the
+    # runs that have finished since the last call, in the order they finish,
+    # each with the tag it was submitted under. server is the URL of an
+    # analysis server to use instead of local worker processes, or None.
+    def __init__(self, workers=2, server=None):
+        self.workers = workers
+        self.server = server
+        self.executor = None
+        self.pending = []
+
+    def submit(self, tag, file_path, sensitivity, sampling_freq, settings):
+        kind = ThreadPoolExecutor if self.server else ProcessPoolExecutor
+        if not isinstance(self.executor, kind):
+            if self.executor is not None:
+                # Runs already submitted still finish
+                self.executor.shutdown(wait=False)
+            if self.server:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                # spawn rather than fork, the parent is running a Tk main loop
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        if self.server:
+            future = self.executor.submit(analyze_run_on_server, self.server, file_path, sensitivity, sampling_freq, settings)
+        else:
+            future = self.executor.submit(analyze_run, file_path, sensitivity, sampling_freq, settings)
+        self.pending.append((tag, future))
+
+    def poll(self):
+        # [(tag, result or None, error or None)]
+        # One done() per future, one finishing during the scan must land in
+        # exactly one of the lists
+        done, pending = [], []
+        for tag, future in self.pending:
+            (done if future.done() else pending).append((tag, future))
+        self.pending = pending
+        finished = []
+        for tag, future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                finished.append((tag, None, e))
+                continue
+            TRACE.add_events([result.pop('event')])
+            finished.append((tag, result, None))
+        if not self.pending and self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        return finished
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Automatic operating-condition segments of a run: idle, accelerating,
+# cruising and braking from the velocity profile, or idle and active from the
+# vibration level alone when there is no profile. Everything is worked out on
+# fixed windows of the record, the raw samples are only read once.
+
+STATES = ('idle', 'accelerating', 'cruise', 'braking', 'active')
+CHUNK_VALUES = 2**24
+
+
+def window_grms(values, window, chunk_values=CHUNK_VALUES):
+    # RMS over all channels of consecutive windows of values (n_samples,
+    # n_channels), the last window may be shorter. Each channel's mean over
+    # the window is taken out first (detrend='constant' in the PSD engine),
+    # so a DC offset such as gravity does not count as vibration. Read in
+    # chunks of whole windows of about chunk_values samples, whatever the
+    # channel count.
+    n = len(values)
+    n_windows = -(-n // window)
+    chunk_windows = max(chunk_values // (window * max(values.shape[1], 1)), 1)
+    ms = np.empty(n_windows)
+    for first in range(0, n_windows, chunk_windows):
+        last = min(first + chunk_windows, n_windows)
+        block = np.asarray(values[first * window:last * window], dtype=np.float64)
+        full = len(block) // window
+        windows = block[:full * window].reshape(full, window, -1)
+        windows = windows - windows.mean(axis=1, keepdims=True)
+        ms[first:first + full] = np.einsum('wsc,wsc->w', windows, windows) / (window * block.shape[1])
+        if full < last - first:
+            tail = block[full * window:]
+            tail = tail - tail.mean(axis=0)
+            ms[first + full] = np.einsum('sc,sc->', tail, tail) / tail.size
+    return np.sqrt(ms)
+
+
+def classify(speed, grms, window_s, idle_speed=2.0, accel_threshold=1.0, idle_fraction=0.2):
+    # State per window. speed in km/h (None without a profile), accel_threshold
+    # in km/h per second. Without a speed to go by, windows below idle_fraction
+    # of the 90th percentile level count as idle.
+    if speed is None:
+        return np.where(grms < idle_fraction * np.percentile(grms, 90), 'idle', 'active')
+    # Smoothed over three windows so a noisy profile does not flicker
+    smooth = np.convolve(np.pad(speed, 1, mode='edge'), np.ones(3) / 3, mode='valid')
+    accel = np.gradient(smooth, window_s) if len(smooth) > 1 else np.zeros_like(smooth)
+    states = np.full(len(speed), 'cruise', dtype=object)
+    states[accel > accel_threshold] = 'accelerating'
+    states[accel < -accel_threshold] = 'braking'
+    states[speed < idle_speed] = 'idle'
+    return states.astype(str)
+
+
+def _runs(states):
+    # (start index, end index exclusive, state) of the runs of equal states
+    change = np.flatnonzero(states[1:] != states[:-1]) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.concatenate([change, [len(states)]])
+    return starts, ends
+
+
+def segment_run(time, values, scale, velocity=None, window_s=1.0, min_duration=3.0, **thresholds):
+    # Named segments of the run as a DataFrame with name, state, start, end
+    # (in the record's time), duration, mean speed and GRMS. velocity is a
+    # (time, speed) pair or None. Runs shorter than min_duration are merged
+    # into the run before them.
+    time = np.asarray(time)
+    fs = 1 / np.median(np.diff(time[:1000]))
+    window = max(int(round(window_s * fs)), 1)
+    grms = window_grms(values, window) * abs(scale)
+    starts_t = time[np.arange(len(grms)) * window]
+    ends_t = time[np.minimum((np.arange(len(grms)) + 1) * window, len(time) - 1)]
+    centres = (starts_t + ends_t) / 2
+    speed = np.interp(centres, *velocity) if velocity is not None else None
+    states = classify(speed, grms, window_s, **thresholds)
+
+    starts, ends = _runs(states)
+    short = (ends - starts) * window_s < min_duration
+    if short.all():
+        short[:] = False
+    # Short runs take the state of the run before them (the first of the one after)
+    keep = np.where(short, -1, np.arange(len(starts)))
+    keep = np.maximum.accumulate(keep)
+    keep[keep < 0] = np.flatnonzero(~short)[0]
+    run_states = states[starts][keep]
+    states = np.repeat(run_states, ends - starts)
+    starts, ends = _runs(states)
+
+    rows = []
+    counters = {}
+    for a, b in zip(starts, ends):
+        state = states[a]
+        counters[state] = counters.get(state, 0) + 1
+        rows.append({
+            'name': f'{state.capitalize()} {counters[state]}',
+            'state': state,
+            'start': starts_t[a],
+            'end': ends_t[b - 1],
+            'duration': ends_t[b - 1] - starts_t[a],
+            'mean_speed': float(speed[a:b].mean()) if speed is not None else np.nan,
+            'grms': float(np.sqrt(np.mean(grms[a:b]**2))),
+        })
+    return pd.DataFrame(rows)
+
+
+def segment_psd_table(f, results, channel_names):
+    # Long format, one row per segment and frequency line
+    frames = []
+    for name, Pxx in results:
+        frame = pd.DataFrame({'segment': name, 'frequency_hz': f})
+        for k, channel in enumerate(channel_names):
+            frame[channel] = Pxx[:, k]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
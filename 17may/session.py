@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+
+# Saved analysis sessions: one .npz bundle holding the settings and results
+# as JSON (under STATE_KEY) plus every result array next to it. The loaded
+# data itself is not copied in, only the source file and its cached record.
+# Results are tuples of arrays and plain values, packed per result.
+
+SESSION_VERSION = 1
+STATE_KEY = 'session'
+
+
+def pack_result(arrays, name, result):
+    # Moves the arrays of result into arrays, returns the JSON-able rest
+    if result is None:
+        return None
+    items = []
+    for k, value in enumerate(result):
+        if isinstance(value, np.ndarray):
+            key = f'{name}_{k}'
+            arrays[key] = value
+            items.append({'array': key})
+        else:
+            items.append({'value': value})
+    return items
+
+
+def unpack_result(arrays, items):
+    if items is None:
+        return None
+    return tuple(arrays[item['array']] if 'array' in item else item['value'] for item in items)
+
+
+def save_session(path, state, arrays):
+    # Written aside and renamed, so a failed save keeps the previous session
+    state = dict(state, version=SESSION_VERSION)
+    with open(path + '.tmp', 'wb') as out:
+        np.savez_compressed(out, **{STATE_KEY: np.array(json.dumps(state))}, **arrays)
+    os.replace(path + '.tmp', path)
+
+
+def load_session(path):
+    # Returns (state, arrays), raises ValueError for files that are not sessions
+    with np.load(path, allow_pickle=False) as bundle:
+        if STATE_KEY not in bundle.files:
+            raise ValueError(f"{os.path.basename(path)} is not a saved session")
+        state = json.loads(str(bundle[STATE_KEY]))
+        if state.get('version') != SESSION_VERSION:
+            raise ValueError(f"session version {state.get('version')} is not supported")
+        arrays = {key: bundle[key] for key in bundle.files if key != STATE_KEY}
+    return state, arrays
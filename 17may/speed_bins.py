@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from psd_engine import segment_spectra, spectral_frequencies, fold_onesided
+
+# PSDs conditioned on vehicle speed. Every Welch segment is put in the speed
+# bin of the velocity at its centre, and the segment powers are summed per
+# bin while going over the record once, so no bin needs its own Welch run.
+
+
+def speed_bin_edges(speeds, width, top=None):
+    # Edges 0, width, 2 width, ... with the last edge above the highest speed
+    # (or top), so every speed from 0 up falls in a bin [edge, next edge).
+    # There is always at least one bin, a standing run is all in the first.
+    if top is None:
+        speeds = np.asarray(speeds, dtype=float)
+        speeds = speeds[np.isfinite(speeds)]
+        if not len(speeds):
+            raise ValueError("the velocity profile has no finite speeds")
+        top = speeds.max()
+    n_bins = int(np.floor(max(top, 0) / width)) + 1
+    return np.arange(n_bins + 1) * width
+
+
+def speed_binned_psd(values, time, sampling_freq, settings, velocity, width, scale=1.0):
+    # velocity is a (time, speed) pair on the same time base as the record,
+    # interpolated at the centre of every segment. Returns f, the bin edges,
+    # the number of segments per bin and the mean spectra of shape
+    # (n_bins, n_freq, n_channels); bins without segments are NaN. Powers are
+    # summed while going over the record, so only mean averaging is possible.
+    settings.validate()
+    if settings.average != 'mean':
+        raise ValueError("speed-binned PSDs are always mean-averaged, set Averaging to mean")
+    step = settings.nperseg - settings.noverlap()
+    n_segments = (len(values) - settings.nperseg) // step + 1
+    centres = np.asarray(time)[np.arange(max(n_segments, 0)) * step + settings.nperseg // 2]
+    speeds = np.interp(centres, *velocity)
+    edges = speed_bin_edges(speeds, width)
+    n_bins = len(edges) - 1
+    # Reversing goes in the first bin, segments without a speed in none
+    valid = np.isfinite(speeds)
+    bins = np.maximum(np.digitize(np.where(valid, speeds, 0), edges) - 1, 0)
+
+    power = 0
+    done = 0
+    for X in segment_spectra(values, sampling_freq, settings, scale):
+        # One-hot (n_bins, n_segments) times the segment powers sums them per bin
+        onehot = np.zeros((n_bins, len(X)))
+        batch = np.flatnonzero(valid[done:done + len(X)])
+        onehot[bins[done + batch], batch] = 1
+        power = power + np.einsum('bs,scf->fbc', onehot, np.abs(X)**2, optimize=True)
+        done += len(X)
+
+    counts = np.bincount(bins[valid], minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = fold_onesided(power / counts[None, :, None], settings)
+    return spectral_frequencies(sampling_freq, settings), edges, counts, mean.transpose(1, 0, 2)
+
+
+def speed_table(f, edges, counts, P, channel_names):
+    # Long format, one row per speed bin, frequency line and channel
+    frames = []
+    for b in np.flatnonzero(counts):
+        frame = pd.DataFrame({'speed_low': edges[b], 'speed_high': edges[b + 1], 'segments': counts[b], 'frequency_hz': f})
+        for k, name in enumerate(channel_names):
+            frame[name] = P[b, :, k]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -6,6 +6,9 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolb
 from matplotlib.figure import Figure
 from scipy.signal import welch
 
+# Channels are shown a page at a time in a 4 x 6 grid, any number of them
+PLOTS_PER_PAGE = 24
+
 
 class VibrationAnalyzer:
     def __init__(self, root):
@@ -16,6 +19,7 @@ class VibrationAnalyzer:
         self.sensitivity = tk.DoubleVar(value=10)
         self.sampling_frequency = tk.DoubleVar(value=25000)
         self.csv_file_path = tk.StringVar()
+        self.page_text = tk.StringVar(value="Page 1 of 1")
 
         # Main notebook for tabs
         self.notebook = ttk.Notebook(self.root)
@@ -48,6 +52,7 @@ class VibrationAnalyzer:
 
         # Plot PSD button
         tk.Button(self.glevel_plots_frame, text="Plot PSD", command=self.plot_psd).pack(side="top")
+        self.add_page_buttons(self.glevel_plots_frame)
 
         # Canvas for plotting G-levels
         self.glevel_fig = plt.Figure(figsize=(14, 10))
@@ -69,6 +74,7 @@ class VibrationAnalyzer:
         # PSD plots tab
         self.psd_plots_frame = tk.Frame(self.notebook)
         self.notebook.add(self.psd_plots_frame, text="PSD Plots")
+        self.add_page_buttons(self.psd_plots_frame)
 
         # Canvas for plotting PSD
         self.psd_fig = plt.Figure(figsize=(14, 10))
@@ -89,11 +95,44 @@ class VibrationAnalyzer:
         # G-levels DataFrame
         self.data = None
 
+        # Page of channels shown, and which plots have been drawn
+        self.page = 0
+        self.glevels_shown = False
+        self.psd_shown = False
+
+    def add_page_buttons(self, frame):
+        page_frame = tk.Frame(frame)
+        page_frame.pack(side="top")
+        tk.Button(page_frame, text="Previous Page", command=lambda: self.change_page(-1)).pack(side="left")
+        tk.Label(page_frame, textvariable=self.page_text).pack(side="left", padx=10)
+        tk.Button(page_frame, text="Next Page", command=lambda: self.change_page(1)).pack(side="left")
+
+    def page_channels(self):
+        # First channel and number of channels on the current page
+        num_channels = len(self.data.columns) - 1  # Exclude time column
+        num_pages = max((num_channels - 1) // PLOTS_PER_PAGE + 1, 1)
+        self.page = min(max(self.page, 0), num_pages - 1)
+        first = self.page * PLOTS_PER_PAGE
+        self.page_text.set("Page {} of {}".format(self.page + 1, num_pages))
+        return first, min(num_channels - first, PLOTS_PER_PAGE)
+
+    def change_page(self, step):
+        if self.data is not None:
+            self.page += step
+            if self.glevels_shown:
+                self.plot_glevels()
+            if self.psd_shown:
+                self.plot_psd()
+
     def load_csv(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
             self.csv_file_path.set(file_path)
             self.data = pd.read_csv(file_path)
+            self.page = 0
+            self.glevels_shown = False
+            self.psd_shown = False
+            self.page_channels()
             messagebox.showinfo("Success", "CSV file loaded successfully.\nPath: {}".format(file_path))
 
 
@@ -172,8 +211,7 @@ class VibrationAnalyzer:
 
     def plot_glevels(self):
         if self.data is not None:
-            num_channels = len(self.data.columns) - 1  # Exclude time column
-            num_plots = min(num_channels, 24)
+            first, num_plots = self.page_channels()
     
             # Calculate number of rows and columns
             num_rows = (num_plots - 1) // 6 + 1
@@ -184,13 +222,13 @@ class VibrationAnalyzer:
     
             # Plot small images of G-levels
             for i in range(num_plots):
-                channel = self.data.columns[i + 1]  # Exclude time column
+                channel = self.data.columns[first + i + 1]  # Exclude time column
                 ax = self.glevel_fig.add_subplot(num_rows, num_cols, i + 1)
-                ax.plot(self.data.iloc[:, 0], self.data.iloc[:, i + 1] / self.sensitivity.get())
+                ax.plot(self.data.iloc[:, 0], self.data.iloc[:, first + i + 1] / self.sensitivity.get())
                 ax.set_title(channel, fontsize=8)
     
                 # Calculate y-axis limit dynamically based on the maximum value of G-levels
-                max_glevel = max(abs(self.data.iloc[:, i + 1] / self.sensitivity.get()))
+                max_glevel = max(abs(self.data.iloc[:, first + i + 1] / self.sensitivity.get()))
                 ax.set_ylim(1e-10, max_glevel * 10)  # Set lower limit to a small positive value for logarithmic scale
                 # ax.set_yscale('log')  # Set y-axis scale to logarithmic
     
@@ -203,6 +241,7 @@ class VibrationAnalyzer:
             self.glevel_fig.subplots_adjust(hspace=1, wspace=0.5, top=0.95)
     
             self.glevel_canvas.draw()
+            self.glevels_shown = True
     
             # Switch to the G-level Plots tab
             self.notebook.select(self.glevel_plots_frame)
@@ -211,7 +250,7 @@ class VibrationAnalyzer:
         if event.inaxes:
             for i, ax in enumerate(self.glevel_fig.axes):
                 if ax == event.inaxes:
-                    self.glevel_plot_index = i
+                    self.glevel_plot_index = self.page * PLOTS_PER_PAGE + i
                     break
 
             if self.glevel_plot_index is not None:
@@ -231,8 +270,8 @@ class VibrationAnalyzer:
 
     def plot_psd(self):
         if self.data is not None:
-            num_channels = len(self.data.columns) - 1  # Exclude time column
-            num_plots = min(num_channels, 24)
+            # Only the channels on the page are computed
+            first, num_plots = self.page_channels()
 
             # Calculate number of rows and columns
             num_rows = (num_plots - 1) // 6 + 1
@@ -243,11 +282,11 @@ class VibrationAnalyzer:
 
             # Plot small images of PSD
             for i in range(num_plots):
-                channel = self.data.columns[i + 1]  # Exclude time column
+                channel = self.data.columns[first + i + 1]  # Exclude time column
                 ax = self.psd_fig.add_subplot(num_rows, num_cols, i + 1)
 
                 # Calculate PSD using Welch method
-                f, p_s_d = welch(self.data.iloc[:, i + 1], fs=self.sampling_frequency.get())
+                f, p_s_d = welch(self.data.iloc[:, first + i + 1].to_numpy(), fs=self.sampling_frequency.get())
 
                 ax.semilogy(f, p_s_d)
                 ax.set_title(channel, fontsize=8)
@@ -259,6 +298,7 @@ class VibrationAnalyzer:
             self.psd_fig.subplots_adjust(hspace=1, wspace=0.5, top=0.95)
 
             self.psd_canvas.draw()
+            self.psd_shown = True
 
             # Switch to the PSD Plots tab
             self.notebook.select(self.psd_plots_frame)
@@ -267,7 +307,7 @@ class VibrationAnalyzer:
         if event.inaxes:
             for i, ax in enumerate(self.psd_fig.axes):
                 if ax == event.inaxes:
-                    self.psd_plot_index = i
+                    self.psd_plot_index = self.page * PLOTS_PER_PAGE + i
                     break
 
             if self.psd_plot_index is not None:
@@ -279,7 +319,7 @@ class VibrationAnalyzer:
             channel = self.data.columns[self.psd_plot_index + 1]  # Exclude time column
 
             # Calculate PSD using Welch method
-            f, p_s_d = welch(self.data.iloc[:, self.psd_plot_index + 1], fs=self.sampling_frequency.get())
+            f, p_s_d = welch(self.data.iloc[:, self.psd_plot_index + 1].to_numpy(), fs=self.sampling_frequency.get())
 
             plt.semilogy(f, p_s_d)
             plt.title(channel)